@@ -1,3 +1,6 @@
+import contextlib
+import json
+import os
 import streamlit as st
 import pandas as pd
 import numpy as np
@@ -5,16 +8,122 @@ from datetime import datetime
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 
-from config import DATA_SOURCE_OPTIONS, YAHOO_PAIRS, LOCAL_PAIRS, STRATEGY_OPTIONS
-from data_loader import load_data
+from config import DATA_SOURCE_OPTIONS, YAHOO_PAIRS, LOCAL_PAIRS, TIMEFRAMES, CHART_MAX_POINTS
+from config import COMPACT_COLUMNS, COMPACT_MODE, INTRADAY_FILE_MAPPING
+from data_loader import data_version, load_data, load_yahoo_pairs
+from engine import add_returns, downcast_columns, split_params, split_train_test
 from indicators import add_indicators
-from strategies import generate_signal
-from metrics import calculate_metrics, calculate_market_return
+from indicator_cache import default_cache
+from strategies import STRATEGIES, default_params, generate_signal, indicator_columns, strategy_names
+from metrics import calculate_metrics, calculate_market_return, periods_per_year
+from portfolio import run_portfolio
+from chart_data import chart_window, decimate_markers, downsample
+from profiling import profile_report, profile_run, record, span, summarize
+from results_store import data_hash, default_store
 
 st.set_page_config(layout="wide")
 st.title("📊 Forex Trading Strategy Backtester")
 st.caption("Test RSI, MACD, and Bollinger Band strategies on major forex pairs")
 
+# ==============================
+# Cached stages
+# ==============================
+# Each stage is keyed only on the settings it depends on, so a widget
+# change reruns from the first stage it affects. data_key is
+# (data_source, pair, start_date, end_date, timeframe, version), where
+# version (data_loader.data_version) changes when the CSV is edited or,
+# for Yahoo Finance, every day. Frames are shared between sessions
+# (cache_resource) and are never modified in place.
+# With config.COMPACT_MODE only the COMPACT_COLUMNS are loaded and the
+# signal stage keeps int8 positions and float32 indicators.
+@st.cache_resource(max_entries=32, show_spinner=False)
+def load_stage(data_key):
+    return load_data(*data_key[:5], columns=COMPACT_COLUMNS if COMPACT_MODE else None)
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def indicator_stage(data_key, strategy, indicator_params):
+    df = load_stage(data_key)
+    if df is None or df.empty:
+        return None
+    return add_indicators(df.copy(), strategy, cache=default_cache, **dict(indicator_params))
+
+
+@st.cache_resource(max_entries=64, show_spinner=False)
+def signal_stage(data_key, strategy, indicator_params, signal_params):
+    """Signals and returns (follow signal with 1 day delay)"""
+    df = indicator_stage(data_key, strategy, indicator_params)
+    if df is None:
+        return None
+    df = df.copy()
+    df['Signal'] = generate_signal(df, strategy, **dict(indicator_params), **dict(signal_params))
+    if COMPACT_MODE:
+        downcast_columns(df, indicator_columns(strategy, **dict(indicator_params)))
+    return add_returns(df, compact=COMPACT_MODE)
+
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def metrics_stage(data_key, strategy, indicator_params, signal_params, split_ratio, bars_per_year):
+    """Train/test metrics (looked up in / added to the results store) and the split date"""
+    df = signal_stage(data_key, strategy, indicator_params, signal_params)
+    train, test = split_train_test(df, split_ratio)
+    key = data_hash(load_stage(data_key))
+    params = dict(indicator_params + signal_params)
+    metrics = default_store.get(key, strategy, params, split_ratio, bars_per_year, with_equity=False)
+    if metrics is None:
+        metrics = {
+            'train': calculate_metrics(train, bars_per_year),
+            'test': calculate_metrics(test, bars_per_year),
+            'market_return': calculate_market_return(df)
+        }
+        default_store.put(key, strategy, params, metrics, df['Cumulative_Strategy'], split_ratio, bars_per_year,
+                          dataset=json.dumps(data_key[:5], default=str), pair=data_key[1])
+    return {**metrics, 'split_date': train.index[-1] if len(train) > 0 else None}
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def chart_stage(data_key, strategy, indicator_params, signal_params, view_start, view_end):
+    """Downsampled lines and thinned markers for the price chart"""
+    df = signal_stage(data_key, strategy, indicator_params, signal_params)
+    view = chart_window(df, view_start, view_end)
+    line_cols = ['Adj Close'] + STRATEGIES[strategy]['overlay'] + STRATEGIES[strategy]['panel']
+    return (downsample(view, line_cols)[line_cols],
+            decimate_markers(view, view['Signal'] == 1)[['Adj Close']],
+            decimate_markers(view, view['Signal'] == -1)[['Adj Close']])
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def portfolio_stage(data_source, pairs, start_date, end_date, timeframe, versions, strategy, params,
+                    weighting, split_ratio, bars_per_year):
+    """versions: each pair's data_version, so edited or newer data reruns"""
+    if data_source == "Yahoo Finance (Live)":
+        # Fetch every pair concurrently into the download cache; load_stage then reads it
+        load_yahoo_pairs(pairs, start_date, end_date)
+    data = {}
+    for pair, version in zip(pairs, versions):
+        df = load_stage((data_source, pair, start_date, end_date, timeframe, version))
+        if df is not None and not df.empty:
+            data[pair] = df
+    if not data:
+        return None
+    return run_portfolio(data, strategy, weighting=weighting, split_ratio=split_ratio,
+                         periods_per_year=bars_per_year, **dict(params))
+
+
+@st.cache_resource(show_spinner="Loading local pairs...")
+def prewarm_local_pairs():
+    """Load every local pair with each strategy's default settings, once per server"""
+    for pair in LOCAL_PAIRS:
+        data_key = (DATA_SOURCE_OPTIONS[1], pair, None, None, None,
+                    data_version(DATA_SOURCE_OPTIONS[1], pair))
+        for name in strategy_names():
+            indicator_params, signal_params = split_params(name, default_params(name))
+            signal_stage(data_key, name, indicator_params, signal_params)
+    return True
+
+
+prewarm_local_pairs()
+
 # ==============================
 # Sidebar
 # ==============================
@@ -50,8 +159,17 @@ else:
     end_date = None
     st.sidebar.info("Using local CSV files - date range from file")
 
+# Bar size (local intraday files are resampled when loaded), only offered
+# when the pair has an intraday file
+timeframe = None
+if data_source != "Yahoo Finance (Live)" and os.path.exists(INTRADAY_FILE_MAPPING.get(selected_pair, '')):
+    timeframe_label = st.sidebar.selectbox("Timeframe", ["Daily (CSV)"] + list(TIMEFRAMES),
+                                           help="Intraday timeframes use the files in data/intraday")
+    timeframe = None if timeframe_label == "Daily (CSV)" else timeframe_label
+bars_per_year = periods_per_year(timeframe)
+
 # Strategy
-strategy = st.sidebar.selectbox("Trading Strategy", STRATEGY_OPTIONS)
+strategy = st.sidebar.selectbox("Trading Strategy", strategy_names())
 
 # Train/Test split
 split_ratio = st.sidebar.slider("Train/Test Split (% for training)", 50, 90, 70)
@@ -59,181 +177,225 @@ split_ratio = st.sidebar.slider("Train/Test Split (% for training)", 50, 90, 70)
 # Strategy parameters
 st.sidebar.header("Parameters")
 
-if strategy == "RSI Strategy":
-    rsi_period = st.sidebar.slider("RSI Period", 5, 30, 14)
-    oversold = st.sidebar.slider("Oversold Threshold", 10, 40, 30)
-    overbought = st.sidebar.slider("Overbought Threshold", 60, 90, 70)
-    
-    params = {
-        'rsi_period': rsi_period,
-        'rsi_oversold': oversold,
-        'rsi_overbought': overbought
-    }
-
-elif strategy == "MACD Strategy":
-    macd_fast = st.sidebar.slider("MACD Fast", 5, 20, 12)
-    macd_slow = st.sidebar.slider("MACD Slow", 20, 40, 26)
-    macd_signal = st.sidebar.slider("MACD Signal", 5, 20, 9)
-    
-    params = {
-        'macd_fast': macd_fast,
-        'macd_slow': macd_slow,
-        'macd_signal': macd_signal
-    }
-
-else:  # Bollinger
-    boll_period = st.sidebar.slider("Bollinger Period", 10, 50, 20)
-    boll_std = st.sidebar.slider("Standard Deviations", 1.0, 3.0, 2.0, 0.5)
-    
-    params = {
-        'boll_period': boll_period,
-        'boll_std': boll_std
-    }
+# One slider per parameter the strategy declares
+params = {}
+for name, spec in STRATEGIES[strategy]['params'].items():
+    params[name] = st.sidebar.slider(spec['label'], spec['min'], spec['max'], spec['default'],
+                                     spec.get('step'))
+
+# Portfolio mode
+st.sidebar.header("Portfolio")
+portfolio_mode = st.sidebar.checkbox("Backtest all pairs as one portfolio",
+                                     help="Runs the strategy on every available pair at once")
+weighting = st.sidebar.selectbox("Weighting", ["equal", "vol_target"], disabled=not portfolio_mode,
+                                 help="Equal capital per pair, or scale each pair to 10% annual volatility")
+
+# Diagnostics
+with st.sidebar.expander("⏱ Diagnostics"):
+    record_timings = st.checkbox("Record stage timings", help="Wall time and rows for each stage of this run")
+    track_memory = st.checkbox("Track memory (slower)", disabled=not record_timings,
+                               help="Allocated memory per stage, measured with tracemalloc")
+    profile_this_run = st.checkbox("Profile this run", help="cProfile the whole run")
 
 run_button = st.sidebar.button("🚀 Run Backtest", type="primary")
 
 # ==============================
-# Main App
+# Price chart
 # ==============================
-if run_button:
-    with st.spinner("Running backtest..."):
-        
-        # Load data
-        df = load_data(data_source, selected_pair, start_date, end_date)
-        
-        if df is None or df.empty:
-            st.error("No data loaded. Please check your settings.")
-            st.stop()
-        
-        # Add indicators
-        df = add_indicators(df, strategy, **params)
-        
-        # Generate signals
-        df['Signal'] = generate_signal(df, strategy, **params)
-        
-        # ==============================
-        # SIMPLE RETURNS CALCULATION
-        # ==============================
-        # Daily returns
-        df['Returns'] = df['Adj Close'].pct_change()
-        
-        # Strategy returns (follow signal with 1 day delay)
-        df['Strategy_Returns'] = df['Signal'].shift(1) * df['Returns']
-        
-        # Cumulative returns (starting from 1)
-        df['Cumulative_Strategy'] = (1 + df['Strategy_Returns']).cumprod()
-        df['Cumulative_Market'] = (1 + df['Returns']).cumprod()
-        
-        # Remove NaN
-        df = df.dropna()
-        
-        # Split into train/test
-        split_idx = int(len(df) * (split_ratio / 100))
-        train = df.iloc[:split_idx]
-        test = df.iloc[split_idx:]
-        
-        # ==============================
-        # Display Results
-        # ==============================
-        st.subheader(f"📊 {selected_pair} - {strategy}")
-        
-        # Calculate metrics
-        train_metrics = calculate_metrics(train)
-        test_metrics = calculate_metrics(test)
-        market_return = calculate_market_return(df)
-        
-        # Metrics row 1 - Profitability
-        col1, col2, col3 = st.columns(3)
-        col1.metric("Test Return", f"{test_metrics['total_return']:.2f}%")
-        col2.metric("Buy-and-Hold Return", f"{market_return:.2f}%")
-        col3.metric("Outperformance", f"{test_metrics['total_return'] - market_return:.2f}%")
-        
-        # Metrics row 2 - Consistency & Context
-        col4, col5, col6, col7 = st.columns(4)
-        col4.metric("Win Rate (Test)", f"{test_metrics['win_rate']:.1f}%")
-        col5.metric("Test Trades", test_metrics['trades'])
-        col6.metric("Train Trades", train_metrics['trades'])
-        col7.metric("Train Return", f"{train_metrics['total_return']:.2f}%")
-        
-        # Equity curve
-        st.subheader("📈 Growth of 1 unit")
-        equity_df = pd.DataFrame({
-            'Strategy': df['Cumulative_Strategy'],
-            'Buy & Hold': df['Cumulative_Market']
-        })
-        st.line_chart(equity_df)
-        
-        # Price chart with signals
-        st.subheader("📉 Price Chart with Signals")
-        
+@st.fragment
+def price_chart(data_key, strategy, indicator_params, signal_params, split_date, date_range):
+    """
+    Price, signals and indicators for the selected date range. Only about
+    CHART_MAX_POINTS points per chart are sent; narrowing the range reruns
+    just this chart with more detail.
+    """
+    first, last, n_rows = date_range
+    view_start, view_end = first, last
+    if n_rows > CHART_MAX_POINTS:
+        view_start, view_end = st.slider("Chart range", min_value=first, max_value=last, value=(first, last),
+                                         help="Narrow the range to see it in full detail")
+    lines, buys, sells = chart_stage(data_key, strategy, indicator_params, signal_params,
+                                     view_start, view_end)
+    params = dict(indicator_params + signal_params)
+    
+    with span('price_figure', rows=len(lines)):
         fig = make_subplots(rows=2, cols=1, shared_xaxes=True, 
                            vertical_spacing=0.05, row_heights=[0.7, 0.3])
-        
+    
         # Price line
-        fig.add_trace(go.Scatter(x=df.index, y=df['Adj Close'],
+        fig.add_trace(go.Scatter(x=lines.index, y=lines['Adj Close'],
                                  name='Price', line=dict(color='blue')), row=1, col=1)
-        
+    
         # Buy signals
-        buys = df[df['Signal'] == 1]
         if len(buys) > 0:
             fig.add_trace(go.Scatter(x=buys.index, y=buys['Adj Close'],
                                      mode='markers', name='Buy',
                                      marker=dict(color='green', size=8, symbol='triangle-up')), row=1, col=1)
-        
+    
         # Sell signals
-        sells = df[df['Signal'] == -1]
         if len(sells) > 0:
             fig.add_trace(go.Scatter(x=sells.index, y=sells['Adj Close'],
                                      mode='markers', name='Sell',
                                      marker=dict(color='red', size=8, symbol='triangle-down')), row=1, col=1)
-        
+    
         # Train/test split line
-        if len(train) > 0:
-            split_date = train.index[-1]
+        if split_date is not None and view_start <= split_date <= view_end:
             fig.add_vline(x=split_date, line_dash="dash", line_color="orange", row=1, col=1)
             fig.add_annotation(x=split_date, y=0.98, yref="paper", text="Train/Test Split",
                               showarrow=False, font=dict(size=10, color="orange"), row=1, col=1)
-        
-        # Indicator subplot
-        if strategy == "RSI Strategy":
-            fig.add_trace(go.Scatter(x=df.index, y=df['RSI'],
-                                     name='RSI', line=dict(color='purple')), row=2, col=1)
-            fig.add_hline(y=overbought, line_dash="dash", line_color="red", row=2, col=1)
-            fig.add_hline(y=oversold, line_dash="dash", line_color="green", row=2, col=1)
-            fig.update_yaxes(title_text="RSI", row=2, col=1)
-            
-        elif strategy == "MACD Strategy":
-            fig.add_trace(go.Scatter(x=df.index, y=df['MACD'],
-                                     name='MACD', line=dict(color='blue')), row=2, col=1)
-            fig.add_trace(go.Scatter(x=df.index, y=df['MACD_signal'],
-                                     name='Signal', line=dict(color='orange')), row=2, col=1)
-            fig.update_yaxes(title_text="MACD", row=2, col=1)
-            
-        else:  # Bollinger
-            fig.add_trace(go.Scatter(x=df.index, y=df['BB_upper'],
-                                     name='Upper Band', line=dict(color='gray', dash='dash')), row=1, col=1)
-            fig.add_trace(go.Scatter(x=df.index, y=df['BB_lower'],
-                                     name='Lower Band', line=dict(color='gray', dash='dash')), row=1, col=1)
-            fig.add_trace(go.Scatter(x=df.index, y=df['BB_middle'],
-                                     name='Middle Band', line=dict(color='black')), row=1, col=1)
-        
+    
+        # Indicators on the price chart and in the subplot
+        for column in STRATEGIES[strategy]['overlay']:
+            fig.add_trace(go.Scatter(x=lines.index, y=lines[column],
+                                     name=column, line=dict(dash='dash')), row=1, col=1)
+        for column in STRATEGIES[strategy]['panel']:
+            fig.add_trace(go.Scatter(x=lines.index, y=lines[column], name=column), row=2, col=1)
+        for level in STRATEGIES[strategy]['levels']:
+            fig.add_hline(y=params[level], line_dash="dash", line_color="gray", row=2, col=1)
+    
         fig.update_layout(height=700, showlegend=True)
         fig.update_xaxes(title_text="Date", row=2, col=1)
+    with span('plotly_chart'):
         st.plotly_chart(fig, use_container_width=True)
+
+# ==============================
+# Main App
+# ==============================
+# Results stay on screen after the first run; later widget changes only
+# recompute the stages they affect
+if run_button:
+    st.session_state['show_results'] = True
+
+# Stage timings / profile of this run (shown at the bottom)
+diagnostics = contextlib.ExitStack()
+spans = diagnostics.enter_context(record(memory=track_memory)) if record_timings else None
+profiler = diagnostics.enter_context(profile_run()) if profile_this_run else None
+
+# Released in finally: st.stop() raises, and tracemalloc is process-wide
+try:
+    if st.session_state.get('show_results') and portfolio_mode:
+        with st.spinner("Running portfolio backtest..."):
+        
+            with span('portfolio_stage', pairs=len(available_pairs)):
+                versions = tuple(data_version(data_source, pair, timeframe) for pair in available_pairs)
+                result = portfolio_stage(data_source, tuple(available_pairs), start_date, end_date,
+                                         timeframe, versions, strategy, tuple(sorted(params.items())),
+                                         weighting, split_ratio, bars_per_year)
+        
+            if result is None:
+                st.error("No data loaded. Please check your settings.")
+                st.stop()
+        
+            train_metrics = result['metrics']['train']
+            test_metrics = result['metrics']['test']
+        
+            st.subheader(f"📊 Portfolio of {len(result['correlation'])} pairs - {strategy} ({weighting})")
         
-        # Recent data
-        st.subheader("📋 Recent Data")
-        display_cols = ['Adj Close', 'Signal', 'Strategy_Returns', 'Cumulative_Strategy']
-        if 'RSI' in df.columns:
-            display_cols.append('RSI')
-        if 'MACD' in df.columns:
-            display_cols.extend(['MACD', 'MACD_signal'])
-        if 'BB_upper' in df.columns:
-            display_cols.extend(['BB_upper', 'BB_middle', 'BB_lower'])
+            col1, col2, col3, col4 = st.columns(4)
+            col1.metric("Test Return", f"{test_metrics['total_return']:.2f}%")
+            col2.metric("Train Return", f"{train_metrics['total_return']:.2f}%")
+            col3.metric("Sharpe (Test)", f"{test_metrics['sharpe']:.2f}")
+            col4.metric("Max Drawdown (Test)", f"{test_metrics['max_drawdown']:.2f}%")
         
-        st.dataframe(df[display_cols].tail(20), use_container_width=True)
+            st.subheader("📈 Growth of 1 unit")
+            st.line_chart(downsample(result['equity'].to_frame()))
+        
+            st.subheader("🔗 Correlation of daily returns")
+            st.dataframe(result['correlation'].round(2), use_container_width=True)
+
+    elif st.session_state.get('show_results'):
+        with st.spinner("Running backtest..."):
+        
+            data_key = (data_source, selected_pair, start_date, end_date, timeframe,
+                        data_version(data_source, selected_pair, timeframe))
+            indicator_params, signal_params = split_params(strategy, params)
+        
+            # Load data, indicators, signals and returns (each cached)
+            with span('signal_stage') as stage:
+                df = signal_stage(data_key, strategy, indicator_params, signal_params)
+                stage.set(rows=len(df) if df is not None else 0)
+        
+            if df is None or df.empty:
+                st.error("No data loaded. Please check your settings.")
+                st.stop()
+        
+            # Split into train/test and calculate metrics
+            with span('metrics_stage', rows=len(df)):
+                metrics = metrics_stage(data_key, strategy, indicator_params, signal_params, split_ratio,
+                                        bars_per_year)
+            train_metrics = metrics['train']
+            test_metrics = metrics['test']
+            market_return = metrics['market_return']
+        
+            # ==============================
+            # Display Results
+            # ==============================
+            st.subheader(f"📊 {selected_pair} - {strategy}")
+        
+            # Metrics row 1 - Profitability
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Test Return", f"{test_metrics['total_return']:.2f}%")
+            col2.metric("Buy-and-Hold Return", f"{market_return:.2f}%")
+            col3.metric("Outperformance", f"{test_metrics['total_return'] - market_return:.2f}%")
+        
+            # Metrics row 2 - Consistency & Context
+            col4, col5, col6, col7 = st.columns(4)
+            col4.metric("Win Rate (Test)", f"{test_metrics['win_rate']:.1f}%")
+            col5.metric("Test Trades", test_metrics['trades'])
+            col6.metric("Train Trades", train_metrics['trades'])
+            col7.metric("Train Return", f"{train_metrics['total_return']:.2f}%")
+        
+            # Metrics row 3 - Risk (test period)
+            col8, col9, col10, col11 = st.columns(4)
+            col8.metric("Sharpe (Test)", f"{test_metrics.get('sharpe', 0):.2f}")
+            col9.metric("Max Drawdown (Test)", f"{test_metrics.get('max_drawdown', 0):.2f}%")
+            col10.metric("Profit Factor (Test)", f"{test_metrics.get('profit_factor', 0):.2f}")
+            col11.metric("Round Trips (Test)", test_metrics.get('round_trips', 0))
+        
+            # Equity curve (downsampled to the chart width)
+            st.subheader("📈 Growth of 1 unit")
+            equity_df = pd.DataFrame({
+                'Strategy': df['Cumulative_Strategy'],
+                'Buy & Hold': df['Cumulative_Market']
+            })
+            with span('equity_chart', rows=len(equity_df)):
+                st.line_chart(downsample(equity_df))
+        
+            # Price chart with signals
+            st.subheader("📉 Price Chart with Signals")
+            split_date = metrics['split_date']
+            price_chart(data_key, strategy, indicator_params, signal_params,
+                        split_date.to_pydatetime() if split_date is not None else None,
+                        (df.index[0].to_pydatetime(), df.index[-1].to_pydatetime(), len(df)))
+        
+            # Recent data
+            st.subheader("📋 Recent Data")
+            display_cols = (['Adj Close', 'Signal', 'Strategy_Returns', 'Cumulative_Strategy']
+                            + STRATEGIES[strategy]['panel'] + STRATEGIES[strategy]['overlay'])
+        
+            st.dataframe(df[display_cols].tail(20), use_container_width=True)
+        
+            # Earlier runs on this data (results store)
+            with st.expander(f"📚 Best stored {strategy} runs on {selected_pair} (test Sharpe)"):
+                st.dataframe(default_store.top(selected_pair, strategy, by='test_sharpe', n=20,
+                                               dataset=json.dumps(data_key[:5], default=str)),
+                             use_container_width=True)
+finally:
+    diagnostics.close()
 
 # Footer
 st.sidebar.markdown("---")
 st.sidebar.caption("Forex Strategy Backtester v2.0")
 st.sidebar.caption("RSI (30/70) | MACD (12/26/9) | Bollinger (20,2)")
+cache_stats = default_cache.stats()
+st.sidebar.caption(f"Indicator cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+
+if spans is not None or profiler is not None:
+    with st.expander("⏱ Stage timings"):
+        if spans is not None:
+            timings = summarize(spans)
+            st.caption(f"{len(timings)} spans, {timings.loc[timings['depth'] == 0, 'seconds'].sum():.3f}s "
+                       "at the top level (cached stages only appear when they recompute)")
+            st.dataframe(timings, use_container_width=True)
+        if profiler is not None:
+            st.code(profile_report(profiler))
@@ -1,62 +1,17 @@
+# backtester.py
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
 
+import numpy as np
 import pandas as pd
-from indicators import add_indicators
-from strategies import generate_rsi_signal, generate_macd_signal, generate_bollinger_signal
+from config import DATA_SOURCE_OPTIONS
+from engine import run_backtest
+from metrics import PERIODS_PER_YEAR, periods_per_year as timeframe_periods
 
-def backtest_strategy(df, strategy_name, initial_capital=10000, **params):
-    """
-    Run backtest for a single currency pair
-    """
-    # Make a copy to avoid modifying original
-    df = df.copy()
-    
-    # Add indicators
-    df = add_indicators(
-        df,
-        rsi_period=params.get('rsi_period', 14),
-        macd_fast=params.get('macd_fast', 12),
-        macd_slow=params.get('macd_slow', 26),
-        macd_signal=params.get('macd_signal', 9),
-        boll_period=params.get('boll_period', 20),
-        boll_std=params.get('boll_std', 2)
-    )
-    
-    # Generate signals
-    if strategy_name == "RSI":
-        df['Signal'] = generate_rsi_signal(
-            df, 
-            oversold_threshold=params.get('oversold', 30),
-            overbought_threshold=params.get('overbought', 70)
-        )
-    elif strategy_name == "MACD":
-        df['Signal'] = generate_macd_signal(df)
-    elif strategy_name == "Bollinger":
-        df['Signal'] = generate_bollinger_signal(df)
-    else:
-        raise ValueError(f"Unknown strategy: {strategy_name}")
-    
-    # Calculate metrics
-    total_return = (df['Portfolio_Value'].iloc[-1] / initial_capital - 1) * 100
-    trades = df[df['Signal'] != 0].shape[0]
-    # After generating signals, ADD THIS SIMPLE CALCULATION:
-
-# Calculate daily returns
-df['Returns'] = df['Adj Close'].pct_change()
-
-# Strategy returns: follow the signal (1 = long, -1 = short, 0 = flat)
-df['Strategy_Returns'] = df['Signal'].shift(1) * df['Returns']
-
-# Calculate cumulative returns (starting from 1)
-df['Cumulative_Strategy'] = (1 + df['Strategy_Returns']).cumprod()
-df['Cumulative_Market'] = (1 + df['Returns']).cumprod()
-
-# Split into train/test
-split_idx = int(len(df) * (split_ratio / 100))
-train = df.iloc[:split_idx]
-test = df.iloc[split_idx:]
 
 # Calculate metrics using returns only
-def calculate_simple_metrics(data):
+def calculate_simple_metrics(data, periods_per_year=PERIODS_PER_YEAR):
     if len(data) == 0:
         return {
             'total_return': 0,
@@ -65,23 +20,23 @@ def calculate_simple_metrics(data):
             'win_rate': 0,
             'trades': 0
         }
-    
+
     total_return = ((1 + data['Strategy_Returns']).prod() - 1) * 100
-    
+
     if data['Strategy_Returns'].std() != 0:
-        sharpe = np.sqrt(252) * data['Strategy_Returns'].mean() / data['Strategy_Returns'].std()
+        sharpe = np.sqrt(periods_per_year) * data['Strategy_Returns'].mean() / data['Strategy_Returns'].std()
     else:
         sharpe = 0
-    
+
     cum_returns = (1 + data['Strategy_Returns']).cumprod()
     peak = cum_returns.cummax()
     drawdown = (cum_returns - peak) / peak
     max_dd = drawdown.min() * 100
-    
+
     trades = (data['Signal'] != 0).sum()
     winning_days = (data['Strategy_Returns'] > 0).sum()
     win_rate = (winning_days / len(data) * 100) if len(data) > 0 else 0
-    
+
     return {
         'total_return': total_return,
         'sharpe': sharpe,
@@ -90,31 +45,24 @@ def calculate_simple_metrics(data):
         'trades': trades
     }
 
-train_metrics = calculate_simple_metrics(train)
-test_metrics = calculate_simple_metrics(test)
-    
-    daily_win = df[df['Strategy_Returns'] > 0]['Strategy_Returns'].count()
-    daily_total = df[df['Strategy_Returns'] != 0]['Strategy_Returns'].count()
-    win_rate = (daily_win / daily_total * 100) if daily_total > 0 else 0
-    
-    metrics = {
-        'total_return': total_return,
-        'number_of_trades': trades,
-        'win_rate': win_rate,
-        'final_value': df['Portfolio_Value'].iloc[-1]
-    }
-    
-    return df, metrics
+
+def backtest_strategy(df, strategy_name, split_ratio=70, periods_per_year=PERIODS_PER_YEAR, **params):
+    """
+    Run backtest for a single currency pair
+    """
+    return run_backtest(df, strategy_name, split_ratio=split_ratio, periods_per_year=periods_per_year,
+                        metrics_fn=calculate_simple_metrics, **params)
+
 
 def backtest_all_pairs(strategy_name, **params):
     """
     Run backtest on all 5 currency pairs
     """
     from data_loader import load_all_pairs
-    
+
     all_data = load_all_pairs()
     results = {}
-    
+
     for ticker, df in all_data.items():
         try:
             df_result, metrics = backtest_strategy(df, strategy_name, **params)
@@ -125,5 +73,115 @@ def backtest_all_pairs(strategy_name, **params):
         except Exception as e:
             print(f"Error processing {ticker}: {e}")
             results[ticker] = {'error': str(e)}
-    
+
     return results
+
+
+# ==============================
+# Batch runner (process pool + shared memory)
+# ==============================
+def _share_frame(df):
+    """
+    Copy a price frame into one shared memory block:
+    int64 index (ns) followed by the float64 columns.
+    Returns (block, descriptor) - the descriptor is all a worker needs.
+    """
+    columns = [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
+    n_rows = len(df)
+    block = shared_memory.SharedMemory(create=True, size=max(1, 8 * n_rows * (1 + len(columns))))
+
+    index = np.ndarray((n_rows,), dtype=np.int64, buffer=block.buf)
+    index[:] = pd.DatetimeIndex(df.index).as_unit('ns').asi8
+    values = np.ndarray((len(columns), n_rows), dtype=np.float64, buffer=block.buf, offset=8 * n_rows)
+    values[:] = df[columns].to_numpy(dtype=np.float64).T
+
+    return block, {'name': block.name, 'n_rows': n_rows, 'columns': columns}
+
+
+# Per-worker state, filled by _init_worker
+_worker_descriptors = {}
+_worker_frames = {}
+_worker_blocks = []
+
+
+def _init_worker(descriptors):
+    _worker_descriptors.update(descriptors)
+
+
+def _worker_frame(pair):
+    """Attach to the pair's shared block once per worker and wrap it without copying"""
+    if pair not in _worker_frames:
+        desc = _worker_descriptors[pair]
+        n_rows = desc['n_rows']
+        block = shared_memory.SharedMemory(name=desc['name'])
+        _worker_blocks.append(block)
+
+        index = np.ndarray((n_rows,), dtype=np.int64, buffer=block.buf)
+        values = np.ndarray((len(desc['columns']), n_rows), dtype=np.float64,
+                            buffer=block.buf, offset=8 * n_rows)
+        _worker_frames[pair] = pd.DataFrame(values.T, index=pd.DatetimeIndex(index),
+                                            columns=desc['columns'], copy=False)
+    return _worker_frames[pair]
+
+
+def _run_job(job_id, pair, strategy_name, params, split_ratio, periods_per_year):
+    try:
+        _, metrics = backtest_strategy(_worker_frame(pair), strategy_name, split_ratio=split_ratio,
+                                       periods_per_year=periods_per_year, **params)
+        return {'job': job_id, 'pair': pair, 'strategy': strategy_name,
+                'params': params, 'metrics': metrics}
+    except Exception as e:
+        return {'job': job_id, 'pair': pair, 'strategy': strategy_name,
+                'params': params, 'error': str(e)}
+
+
+def run_batch(jobs, data=None, split_ratio=70, max_workers=None, data_source=DATA_SOURCE_OPTIONS[1],
+              start_date=None, end_date=None, timeframe=None, periods_per_year=None):
+    """
+    Run many (pair, strategy, params) backtests over a process pool.
+
+    Each pair's prices are placed in shared memory once and read in place
+    by the workers, so only the job tuple and the metrics are pickled.
+    Results are yielded as they complete (not in job order); each carries
+    its position in ``jobs`` under 'job'.
+
+    data: optional {pair: DataFrame}; pairs not given are loaded with
+    data_loader.load_all_pairs from data_source (dates and timeframe as
+    in data_loader.load_data). periods_per_year defaults to the
+    timeframe's (metrics.periods_per_year).
+    """
+    jobs = [(pair, strategy_name, dict(params or {})) for pair, strategy_name, params in jobs]
+    data = dict(data or {})
+    missing = sorted({pair for pair, _, _ in jobs} - set(data))
+    if missing:
+        from data_loader import load_all_pairs
+        data.update(load_all_pairs(data_source, pairs=missing, start_date=start_date,
+                                   end_date=end_date, timeframe=timeframe))
+    if periods_per_year is None:
+        periods_per_year = timeframe_periods(timeframe)
+
+    blocks = []
+    try:
+        descriptors = {}
+        for pair in sorted({pair for pair, _, _ in jobs} & set(data)):
+            block, descriptors[pair] = _share_frame(data[pair])
+            blocks.append(block)
+
+        for job_id, (pair, strategy_name, params) in enumerate(jobs):
+            if pair not in descriptors:
+                yield {'job': job_id, 'pair': pair, 'strategy': strategy_name,
+                       'params': params, 'error': f"No data for {pair}"}
+
+        max_workers = max_workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(descriptors,)) as pool:
+            futures = [pool.submit(_run_job, job_id, pair, strategy_name, params, split_ratio,
+                                   periods_per_year)
+                       for job_id, (pair, strategy_name, params) in enumerate(jobs)
+                       if pair in descriptors]
+            for future in as_completed(futures):
+                yield future.result()
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
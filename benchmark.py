@@ -0,0 +1,215 @@
+# benchmark.py
+"""
+Benchmarks for the backtest hot path on synthetic data.
+
+    python benchmark.py --bars 1000 100000 1000000 --pairs 3 --output bench.json
+    python benchmark.py --compare old.json new.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from price_store import close_stores, load_prices
+from indicators import add_indicators
+from strategies import generate_signal, strategy_names
+from metrics import calculate_metrics
+from engine import add_returns
+
+
+def synthetic_ohlc(n_bars, seed=0, start="2000-01-03", freq="min", start_price=1.1, volatility=0.0005):
+    """
+    Random-walk OHLC bars in the same layout as the local CSVs
+    (Open, High, Low, Close, Adj Close, Volume with a Date index).
+    """
+    rng = np.random.default_rng(seed)
+    close = start_price * np.exp(np.cumsum(rng.normal(0, volatility, n_bars)))
+    open_ = np.empty(n_bars)
+    open_[0] = start_price
+    open_[1:] = close[:-1]
+    wick = np.abs(rng.normal(0, volatility / 2, (2, n_bars)))
+    high = np.maximum(open_, close) * (1 + wick[0])
+    low = np.minimum(open_, close) * (1 - wick[1])
+
+    index = pd.date_range(start, periods=n_bars, freq=freq, name="Date")
+    return pd.DataFrame({
+        'Open': open_, 'High': high, 'Low': low, 'Close': close,
+        'Adj Close': close, 'Volume': np.zeros(n_bars, dtype=np.int64)
+    }, index=index)
+
+
+def synthetic_pairs(n_bars, n_pairs, seed=0, **kwargs):
+    """{ticker: frame} for n_pairs independent synthetic pairs"""
+    return {f"SYN{i}=X": synthetic_ohlc(n_bars, seed=seed + i, **kwargs) for i in range(n_pairs)}
+
+
+def measure(fn, repeat=1):
+    """
+    Run fn `repeat` times; return (result, best seconds, peak traced bytes).
+    Peak memory comes from one extra run under tracemalloc so the tracing
+    overhead stays out of the timings.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+
+    result = None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return result, best, peak
+
+
+def run_benchmarks(bar_counts, n_pairs=1, strategies=None, repeat=3, data_dir=None):
+    """
+    Time every pipeline stage for each size; returns a list of result rows.
+    The synthetic CSVs and their columnar stores live in a temporary
+    directory (under data_dir if given) that is removed afterwards.
+    """
+    strategies = strategies or strategy_names()
+    rows = []
+
+    with tempfile.TemporaryDirectory(dir=data_dir) as tmp:
+        try:
+            for n_bars in bar_counts:
+                rows += _run_size(n_bars, n_pairs, strategies, repeat, tmp)
+        finally:
+            # Release the memory-mapped stores before the directory goes
+            close_stores(tmp)
+    return rows
+
+
+def _run_size(n_bars, n_pairs, strategies, repeat, tmp):
+    rows = []
+    pairs = synthetic_pairs(n_bars, n_pairs)
+    paths = []
+    for ticker, frame in pairs.items():
+        path = os.path.join(tmp, f"{ticker}_{n_bars}.csv")
+        frame.to_csv(path)
+        paths.append(path)
+
+    def load_all():
+        return [load_prices(path, cache_dir=tmp) for path in paths]
+
+    def record(stage, strategy, seconds, peak):
+        rows.append({'stage': stage, 'strategy': strategy, 'bars': n_bars, 'pairs': n_pairs,
+                     'seconds': seconds, 'peak_bytes': peak})
+        print(f"{stage:<18} {strategy or '':<20} {n_bars:>10} bars x{n_pairs}: "
+              f"{seconds * 1000:10.2f} ms  peak {peak / 1e6:9.1f} MB", file=sys.stderr)
+
+    # First load converts the CSV, later loads hit the columnar store
+    start = time.perf_counter()
+    tracemalloc.start()
+    try:
+        load_all()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    seconds = time.perf_counter() - start
+    record('load_data_cold', None, seconds, peak)
+    loaded, seconds, peak = measure(load_all, repeat)
+    record('load_data', None, seconds, peak)
+
+    for strategy in strategies:
+        frames, seconds, peak = measure(
+            lambda: [add_indicators(df.copy(), strategy) for df in loaded], repeat)
+        record('add_indicators', strategy, seconds, peak)
+
+        signals, seconds, peak = measure(
+            lambda: [generate_signal(df, strategy) for df in frames], repeat)
+        record('generate_signal', strategy, seconds, peak)
+        for df, sig in zip(frames, signals):
+            df['Signal'] = sig
+
+        results, seconds, peak = measure(
+            lambda: [add_returns(df.copy()) for df in frames], repeat)
+        record('returns_pipeline', strategy, seconds, peak)
+
+        _, seconds, peak = measure(lambda: [calculate_metrics(df) for df in results], repeat)
+        record('calculate_metrics', strategy, seconds, peak)
+
+    return rows
+
+
+def environment():
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count()
+    }
+
+
+def compare(old_path, new_path, threshold=0.10):
+    """Print new/old time ratios per stage; returns the rows slower than 1 + threshold"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    def key(row):
+        return (row['stage'], row['strategy'], row['bars'], row['pairs'])
+
+    old_rows = {key(row): row for row in old['results']}
+    regressions = []
+    for row in new['results']:
+        base = old_rows.get(key(row))
+        if base is None or base['seconds'] == 0:
+            continue
+        ratio = row['seconds'] / base['seconds']
+        mem_ratio = row['peak_bytes'] / base['peak_bytes'] if base['peak_bytes'] else float('nan')
+        flag = "REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{row['stage']:<18} {row['strategy'] or '':<20} {row['bars']:>10}: "
+              f"time x{ratio:5.2f}  memory x{mem_ratio:5.2f}  {flag}")
+        if flag:
+            regressions.append(row)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the backtest pipeline on synthetic data")
+    parser.add_argument('--bars', type=int, nargs='+', default=[1000, 10000, 100000, 1000000])
+    parser.add_argument('--pairs', type=int, default=1)
+    parser.add_argument('--strategies', nargs='+', default=strategy_names())
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="write results as JSON to this file")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help="compare two result files instead of running")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="slowdown ratio reported as a regression (default 0.10)")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return 1 if compare(*args.compare, threshold=args.threshold) else 0
+
+    rows = run_benchmarks(args.bars, args.pairs, args.strategies, args.repeat)
+    report = {'environment': environment(), 'results': rows}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# chart_data.py
+"""
+Server-side downsampling for charts: send about one point per pixel,
+keeping the peaks and troughs of each series, whatever its length.
+"""
+import numpy as np
+import pandas as pd
+from config import CHART_MAX_POINTS
+
+
+def _minmax_indices(y, n_buckets):
+    """First, last, and the min and max row of each of n_buckets equal buckets"""
+    n = len(y)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+    starts = np.linspace(0, n, n_buckets, endpoint=False).astype(np.int64)
+    bucket = np.repeat(np.arange(n_buckets), np.diff(np.append(starts, n)))
+
+    picks = [np.array([0, n - 1])]
+    for fill, reduce in ((np.inf, np.minimum), (-np.inf, np.maximum)):
+        values = np.where(np.isnan(y), fill, y)
+        extreme = reduce.reduceat(values, starts)
+        hits = np.flatnonzero(values == extreme[bucket])
+        _, first = np.unique(bucket[hits], return_index=True)
+        picks.append(hits[first])
+    return np.unique(np.concatenate(picks))
+
+
+def _lttb_indices(y, n_out):
+    """Largest-Triangle-Three-Buckets: n_out rows that keep the visual shape"""
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        next_y = y[hi:next_hi]
+        avg_x = (hi + next_hi - 1) / 2
+        avg_y = np.nanmean(next_y) if np.any(~np.isnan(next_y)) else y[a]
+        xs = np.arange(lo, hi)
+        area = np.abs((a - avg_x) * (y[lo:hi] - y[a]) - (a - xs) * (avg_y - y[a]))
+        a = lo + int(np.argmax(np.where(np.isnan(area), -1.0, area)))
+        out[i + 1] = a
+    return out
+
+
+def downsample(df, columns=None, max_points=CHART_MAX_POINTS, method='minmax'):
+    """
+    Rows of df to plot for ``columns`` (default: all numeric columns).
+    'minmax' keeps each bucket's extremes, 'lttb' the points that best
+    preserve the line's shape. The columns share the point budget and
+    their picks are combined, so all traces have one x axis.
+    """
+    if len(df) <= max_points:
+        return df
+    columns = columns or [col for col in df.columns if pd.api.types.is_numeric_dtype(df[col])]
+    budget = max(max_points // max(len(columns), 1), 4)
+    picks = []
+    for col in columns:
+        y = df[col].to_numpy(dtype=float)
+        if method == 'minmax':
+            picks.append(_minmax_indices(y, budget // 2))
+        elif method == 'lttb':
+            picks.append(_lttb_indices(y, budget))
+        else:
+            raise ValueError(f"Unknown downsampling method: {method}")
+    return df.iloc[np.unique(np.concatenate(picks))]
+
+
+def decimate_markers(df, mask, max_points=CHART_MAX_POINTS):
+    """At most one marked row (the first) per 1/max_points of the rows"""
+    rows = np.flatnonzero(np.asarray(mask))
+    if len(rows) <= max_points:
+        return df.iloc[rows]
+    bucket = rows * max_points // max(len(df), 1)
+    _, first = np.unique(bucket, return_index=True)
+    return df.iloc[rows[first]]
+
+
+def chart_window(df, start=None, end=None):
+    """Rows between start and end (inclusive), found by binary search on the index"""
+    lo = df.index.searchsorted(pd.Timestamp(start), side='left') if start is not None else 0
+    hi = df.index.searchsorted(pd.Timestamp(end), side='right') if end is not None else len(df)
+    return df.iloc[lo:hi]
@@ -0,0 +1,164 @@
+# cli.py
+"""
+Run backtests from a JSON job file without the Streamlit app.
+
+    python cli.py jobs.json --output results.parquet
+
+Job file:
+
+    {
+        "data_source": "Selected Backtest Pairs (5 Major Forex Pairs)",
+        "start_date": "2020-01-01",
+        "end_date": "2024-01-01",
+        "split_ratio": 70,
+        "timeframe": "5m",
+        "compact": true,
+        "jobs": [
+            {"pairs": ["EURUSD=X", "GBPUSD=X"], "strategy": "RSI Strategy",
+             "params": {"rsi_period": 14, "rsi_oversold": 30, "rsi_overbought": 70}},
+            {"pair": "USDJPY=X", "strategy": "MACD Strategy"}
+        ],
+        "output": "results.csv"
+    }
+
+Everything except "jobs" is optional; a job without pairs runs on all
+local pairs. "timeframe" (1m, 5m, 15m, 1h, 4h, D) runs on the intraday
+files resampled to that bar size and annualizes the metrics for it.
+"compact" loads only Adj Close and keeps a small working frame (int8
+positions, float32 indicators; see engine.prepare_backtest).
+Results have one row per (pair, job) with the train_/test_ metrics, the
+buy-and-hold return and an error column.
+
+Results are kept in the results store (config.RESULTS_DB_PATH), so a
+job that was already run on the same data is answered from it; --refresh
+reruns everything, --no-store skips the store.
+
+--timings appends per-stage spans (load_data, add_indicators, ...; see
+profiling.py) to a JSON-lines file, --profile writes a cProfile dump.
+"""
+import argparse
+import contextlib
+import json
+import logging
+import sys
+
+import pandas as pd
+
+from config import COMPACT_COLUMNS, DATA_SOURCE_OPTIONS, LOCAL_PAIRS, RESULTS_DB_PATH
+from data_loader import load_data
+from engine import run_backtest
+from indicator_cache import default_cache
+from metrics import periods_per_year
+from profiling import export_jsonl, profile_run, record, span
+from results_store import ResultsStore, run_backtest_stored
+
+
+def load_jobs(path):
+    """Read a job file, returns (settings, [(pair, strategy, params), ...])"""
+    with open(path) as f:
+        config = json.load(f)
+
+    jobs = []
+    for job in config['jobs']:
+        pairs = job.get('pairs') or ([job['pair']] if 'pair' in job else LOCAL_PAIRS)
+        for pair in pairs:
+            jobs.append((pair, job['strategy'], dict(job.get('params') or {})))
+    return config, jobs
+
+
+def run_jobs(jobs, data_source=DATA_SOURCE_OPTIONS[1], start_date=None, end_date=None, split_ratio=70,
+             timeframe=None, compact=False, store=None, refresh=False):
+    """
+    Run every job in this process, returns one row per job as a DataFrame
+    With a ResultsStore, jobs already run on the same data are looked up.
+    """
+    start_date = pd.Timestamp(start_date) if start_date else None
+    end_date = pd.Timestamp(end_date) if end_date else None
+
+    frames = {}
+    rows = []
+    for pair, strategy, params in jobs:
+        row = {'pair': pair, 'strategy': strategy, **params, 'error': None}
+        try:
+            if pair not in frames:
+                frames[pair] = load_data(data_source, pair, start_date, end_date, timeframe,
+                                         COMPACT_COLUMNS if compact else None)
+            df = frames[pair]
+            if df is None or df.empty:
+                raise ValueError(f"No data for {pair}")
+
+            with span('job', rows=len(df), pair=pair, strategy=strategy):
+                if store is None:
+                    _, metrics = run_backtest(df, strategy, split_ratio=split_ratio, cache=default_cache,
+                                              periods_per_year=periods_per_year(timeframe), compact=compact,
+                                              **params)
+                else:
+                    dataset = json.dumps([data_source, pair, start_date, end_date, timeframe], default=str)
+                    metrics = run_backtest_stored(df, strategy, store, dataset=dataset, pair=pair,
+                                                  split_ratio=split_ratio,
+                                                  periods_per_year=periods_per_year(timeframe),
+                                                  refresh=refresh, cache=default_cache, compact=compact,
+                                                  **params)
+            for period in ('train', 'test'):
+                row.update({f'{period}_{key}': value for key, value in metrics[period].items()})
+            row['market_return'] = metrics['market_return']
+        except Exception as e:
+            row['error'] = str(e)
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def write_results(results, path):
+    """Parquet for .parquet / .pq paths, CSV otherwise"""
+    if path.endswith(('.parquet', '.pq')):
+        results.to_parquet(path, index=False)
+    else:
+        results.to_csv(path, index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run backtest jobs from a JSON file")
+    parser.add_argument('jobs', help="job file (JSON)")
+    parser.add_argument('--output', help="results file (.parquet or .csv); overrides the job file")
+    parser.add_argument('--results-db', default=RESULTS_DB_PATH, help="results store (SQLite)")
+    parser.add_argument('--no-store', action='store_true', help="don't look up or store results")
+    parser.add_argument('--refresh', action='store_true', help="rerun jobs that are already stored")
+    parser.add_argument('--timings', help="append stage timings to this JSON-lines file")
+    parser.add_argument('--profile', help="write a cProfile dump of the run to this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    config, jobs = load_jobs(args.jobs)
+    with contextlib.ExitStack() as diagnostics:
+        spans = diagnostics.enter_context(record()) if args.timings else None
+        if args.profile:
+            diagnostics.enter_context(profile_run(args.profile))
+        results = run_jobs(jobs,
+                           data_source=config.get('data_source', DATA_SOURCE_OPTIONS[1]),
+                           start_date=config.get('start_date'),
+                           end_date=config.get('end_date'),
+                           split_ratio=config.get('split_ratio', 70),
+                           timeframe=config.get('timeframe'),
+                           compact=config.get('compact', False),
+                           store=None if args.no_store else ResultsStore(args.results_db),
+                           refresh=args.refresh)
+
+    if spans is not None:
+        export_jsonl(spans, args.timings, run=pd.Timestamp.now().isoformat(), jobs=args.jobs)
+        logging.info("Wrote %d spans to %s", len(spans), args.timings)
+
+    output = args.output or config.get('output')
+    if output:
+        write_results(results, output)
+        logging.info("Wrote %d results to %s", len(results), output)
+    else:
+        results.to_csv(sys.stdout, index=False)
+
+    failed = results['error'].notna().sum()
+    if failed:
+        logging.error("%d of %d jobs failed", failed, len(results))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,247 @@
+# composite.py
+"""
+Composite strategies: AND / OR / NOT / majority vote / "persist for N
+bars" over the buy and sell signals of the registered strategies.
+
+    trend = buy("MACD Strategy") & persist(buy("RSI Strategy", rsi_oversold=40), 3)
+    exit_ = sell("MACD Strategy") | sell("Bollinger Strategy")
+    register_composite("MACD + RSI", trend, exit_)
+
+Rules are hashable expression keys. Evaluating a batch of rules computes
+every indicator once (see indicators.compute_indicators), every
+strategy's buy/sell masks once per parameter set, and every distinct
+sub-expression once, each as a whole-array NumPy operation.
+"""
+import numpy as np
+import pandas as pd
+from indicators import compute_indicators
+from strategies import STRATEGIES, register_strategy, required_indicators, resolve_params
+from sweep import METRIC_KEYS, price_returns, score_signals
+
+
+class Rule:
+    """A boolean signal expression; combine with &, | and ~"""
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __and__(self, other):
+        return all_of(self, other)
+
+    def __or__(self, other):
+        return any_of(self, other)
+
+    def __invert__(self):
+        return negate(self)
+
+    def __eq__(self, other):
+        return isinstance(other, Rule) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f"Rule({self.key!r})"
+
+
+def _leaf(side, strategy, params):
+    params = resolve_params(strategy, params)
+    return Rule((side, strategy, tuple(sorted(params.items()))))
+
+
+def buy(strategy, **params):
+    """The strategy's buy condition (before sell overrides it)"""
+    return _leaf('buy', strategy, params)
+
+
+def sell(strategy, **params):
+    """The strategy's sell condition"""
+    return _leaf('sell', strategy, params)
+
+
+def _children(op, rules):
+    """Flatten nested ops of the same kind and sort, so equal expressions share a key"""
+    keys = set()
+    for rule in rules:
+        keys.update(rule.key[1:] if rule.key[0] == op else (rule.key,))
+    return tuple(sorted(keys, key=repr))
+
+
+def all_of(*rules):
+    children = _children('and', rules)
+    return Rule(children[0]) if len(children) == 1 else Rule(('and',) + children)
+
+
+def any_of(*rules):
+    children = _children('or', rules)
+    return Rule(children[0]) if len(children) == 1 else Rule(('or',) + children)
+
+
+def negate(rule):
+    return Rule(rule.key[1]) if rule.key[0] == 'not' else Rule(('not', rule.key))
+
+
+def vote(*rules, min_true=None):
+    """True where at least min_true of the rules are (default: a majority)"""
+    children = tuple(sorted({rule.key for rule in rules}, key=repr))
+    min_true = len(children) // 2 + 1 if min_true is None else min_true
+    return Rule(('vote', min_true) + children)
+
+
+def persist(rule, bars):
+    """True where the rule has been true for the last ``bars`` bars"""
+    return rule if bars <= 1 else Rule(('persist', bars, rule.key))
+
+
+def _leaves(key, found):
+    op = key[0]
+    if op in ('buy', 'sell'):
+        found.add((key[1], key[2]))
+    elif op in ('and', 'or'):
+        for child in key[1:]:
+            _leaves(child, found)
+    elif op == 'vote':
+        for child in key[2:]:
+            _leaves(child, found)
+    elif op in ('not', 'persist'):
+        _leaves(key[-1], found)
+    else:
+        raise ValueError(f"Unknown rule operator: {op}")
+    return found
+
+
+def _requests(rules):
+    """{(strategy, params): {local name: (indicator, args)}} for every leaf of the rules"""
+    found = set()
+    for rule in rules:
+        _leaves(rule.key, found)
+    return {leaf: required_indicators(leaf[0], **dict(leaf[1])) for leaf in found}
+
+
+def _lookback(key):
+    """Bars of history the rule's value on a bar depends on"""
+    op = key[0]
+    if op in ('buy', 'sell'):
+        return STRATEGIES[key[1]]['lookback']
+    if op == 'persist':
+        return _lookback(key[2]) + key[1] - 1
+    children = key[2:] if op == 'vote' else key[1:]
+    return max(_lookback(child) for child in children)
+
+
+def _persist(mask, bars):
+    # Trailing count of true bars from a cumulative sum
+    counts = np.cumsum(mask, axis=0, dtype=np.int32)
+    counts[bars:] -= counts[:-bars].copy()
+    return counts >= bars
+
+
+def evaluate(rules, price, cache=None, indicators=None):
+    """
+    Evaluate rules on a price array (1-D, or one column per series).
+    indicators: already planned {(name, args): {column: array}}; computed
+    here (with the optional IndicatorCache) when not given.
+    Returns (masks, valid), bool arrays with the rules on a new last axis;
+    valid marks rows where every indicator a rule reads is warmed up.
+    """
+    price = np.asarray(price, dtype=float)
+    requests = _requests(rules)
+    if indicators is None:
+        wanted = [request for needed in requests.values() for request in needed.values()]
+        indicators = compute_indicators(price, wanted, cache)
+
+    memo = {}
+    for (strategy, params), needed in requests.items():
+        local = {name: indicators[(ind, tuple(args))] for name, (ind, args) in needed.items()}
+        buy_mask, sell_mask = STRATEGIES[strategy]['rule'](price, local, dict(params))
+        ready = np.ones(price.shape, dtype=bool)
+        for columns in local.values():
+            for values in columns.values():
+                ready &= ~np.isnan(values)
+        memo[('buy', strategy, params)] = (np.asarray(buy_mask, dtype=bool), ready)
+        memo[('sell', strategy, params)] = (np.asarray(sell_mask, dtype=bool), ready)
+
+    def run(key):
+        if key in memo:
+            return memo[key]
+        op = key[0]
+        if op == 'not':
+            mask, ready = run(key[1])
+            mask = ~mask
+        elif op == 'persist':
+            mask, ready = run(key[2])
+            mask = _persist(mask, key[1])
+        else:
+            parts = [run(child) for child in (key[2:] if op == 'vote' else key[1:])]
+            ready = np.logical_and.reduce([r for _, r in parts])
+            if op == 'and':
+                mask = np.logical_and.reduce([m for m, _ in parts])
+            elif op == 'or':
+                mask = np.logical_or.reduce([m for m, _ in parts])
+            else:
+                mask = np.sum([m for m, _ in parts], axis=0, dtype=np.int32) >= key[1]
+        memo[key] = (mask, ready)
+        return memo[key]
+
+    results = [run(rule.key) for rule in rules]
+    return (np.stack([mask for mask, _ in results], axis=-1),
+            np.stack([ready for _, ready in results], axis=-1))
+
+
+def composite_signals(composites, price, cache=None, indicators=None):
+    """
+    int8 signal matrix for [(buy rule, sell rule), ...], one column per
+    composite (sell overrides buy), plus the matching valid matrix.
+    All composites are evaluated together, so they share sub-expressions.
+    """
+    rules = [rule for pair in composites for rule in pair]
+    masks, ready = evaluate(rules, price, cache, indicators)
+    buy_masks, sell_masks = masks[..., 0::2], masks[..., 1::2]
+    signals = np.where(sell_masks, -1, np.where(buy_masks, 1, 0)).astype(np.int8)
+    return signals, ready[..., 0::2] & ready[..., 1::2]
+
+
+def register_composite(name, buy_rule, sell_rule, overlay=(), panel=(), levels=()):
+    """
+    Add a composite to the strategies registry, so the app, engine and
+    CLI can run it like any other strategy (its params are fixed).
+    """
+    needed = {request for requests in _requests([buy_rule, sell_rule]).values()
+              for request in requests.values()}
+    needed = {(ind, tuple(args)): (ind, tuple(args)) for ind, args in needed}
+
+    @register_strategy(name, params={}, indicators=lambda p: needed, overlay=overlay, panel=panel,
+                       levels=levels, lookback=max(_lookback(buy_rule.key), _lookback(sell_rule.key)))
+    def rule(price, ind, p):
+        masks, _ = evaluate([buy_rule, sell_rule], price, indicators=ind)
+        return masks[..., 0], masks[..., 1]
+    return rule
+
+
+def run_composites(df, composites, split_ratio=70, rank_by='train_total_return', chunk_size=256,
+                   hold=False, cost=0.0, cache=None):
+    """
+    Backtest many composites ({name: (buy rule, sell rule)}) on one pair
+    in a single batch and return a results table ranked by ``rank_by``.
+    Rules are evaluated once for the whole batch; metrics are scored
+    chunk_size composites at a time (see sweep.score_signals).
+    """
+    names = list(composites)
+    price, returns = price_returns(df)
+    signals, valid = composite_signals([composites[name] for name in names], price, cache)
+
+    # Rows that dropna would drop no matter which composite is used
+    valid &= (df.notna().all(axis=1).to_numpy() & ~np.isnan(returns))[:, None]
+
+    results = {f'{prefix}_{key}': [] for prefix in ('train', 'test') for key in METRIC_KEYS}
+    for start in range(0, len(names), chunk_size):
+        cols = slice(start, start + chunk_size)
+        chunk_metrics = score_signals(price, signals[:, cols], valid[:, cols], split_ratio, hold, cost)
+        for column, values in chunk_metrics.items():
+            results[column].append(values)
+
+    table = pd.DataFrame({'composite': names})
+    for column, parts in results.items():
+        table[column] = np.concatenate(parts) if parts else []
+    return table.sort_values(rank_by, ascending=False, kind='stable').reset_index(drop=True)
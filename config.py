@@ -1,5 +1,4 @@
 # config.py
-import streamlit as st
 
 # Data source selection
 DATA_SOURCE_OPTIONS = [
@@ -26,4 +25,49 @@ LOCAL_FILE_MAPPING = {
     "USDJPY=X": "data/USDJPY=X.csv"
 }
 
-STRATEGY_OPTIONS = ["RSI Strategy", "MACD Strategy", "Bollinger Strategy"]
+# Intraday bar or tick files (resampled to the chosen timeframe when loaded)
+INTRADAY_FILE_MAPPING = {
+    "EURUSD=X": "data/intraday/EURUSD=X.csv",
+    "GBPUSD=X": "data/intraday/GBPUSD=X.csv",
+    "AUDUSD=X": "data/intraday/AUDUSD=X.csv",
+    "USDCAD=X": "data/intraday/USDCAD=X.csv",
+    "USDJPY=X": "data/intraday/USDJPY=X.csv"
+}
+
+# Bar sizes for resampling intraday data (pandas offsets)
+TIMEFRAMES = {"1m": "1min", "5m": "5min", "15m": "15min", "1h": "1h", "4h": "4h", "D": "1D"}
+
+# Binary columnar copies of the local CSVs (rebuilt when a CSV changes)
+PRICE_CACHE_DIR = "data/cache"
+
+# On-disk cache for Yahoo Finance downloads (least recently used tickers are evicted)
+YAHOO_CACHE_DIR = "data/yahoo_cache"
+YAHOO_CACHE_MAX_BYTES = 200 * 1024 * 1024
+
+# Finished backtests (metrics and equity curves) keyed by a hash of the price data
+RESULTS_DB_PATH = "data/results.sqlite"
+
+# In-memory cache for indicator arrays (least recently used entries are evicted)
+INDICATOR_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Trading costs in pips: spread is the full bid/ask spread, commission is charged per side
+DEFAULT_COSTS = {"spread": 1.0, "commission": 0.0}
+PAIR_COSTS = {
+    "EURUSD=X": {"spread": 0.6, "commission": 0.0},
+    "GBPUSD=X": {"spread": 0.9, "commission": 0.0},
+    "AUDUSD=X": {"spread": 0.8, "commission": 0.0},
+    "USDCAD=X": {"spread": 1.2, "commission": 0.0},
+    "USDJPY=X": {"spread": 0.7, "commission": 0.0}
+}
+INITIAL_CAPITAL = 10000.0
+
+# Most points sent to the browser per chart (series are downsampled to this)
+CHART_MAX_POINTS = 2000
+
+# Compact mode: only these columns are loaded, the position is int8 and
+# indicators are stored as float32 (prices stay float64). The float32
+# indicator error must stay below FLOAT32_TOLERANCE times the column's
+# largest magnitude and the metrics must match full mode (tests/test_compact.py)
+COMPACT_MODE = False
+COMPACT_COLUMNS = ['Adj Close']
+FLOAT32_TOLERANCE = 1e-6
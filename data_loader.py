@@ -1,88 +1,72 @@
 # data_loader.py
-import pandas as pd
+import logging
 import os
-from config import LOCAL_FILE_MAPPING
-import streamlit as st
+import sys
+from datetime import date
+from config import DATA_SOURCE_OPTIONS, INTRADAY_FILE_MAPPING, LOCAL_FILE_MAPPING, LOCAL_PAIRS, YAHOO_PAIRS
+from price_store import load_prices, source_stamp
+from yahoo_cache import load_cached, load_many
+from profiling import timed
 
-def load_data(data_source, ticker, start_date=None, end_date=None):
+logger = logging.getLogger(__name__)
+
+
+def _notify(level, message):
+    """
+    Show a message in the Streamlit app when running inside it, log it otherwise.
+    streamlit is never imported here so headless runs don't load it.
+    """
+    st = sys.modules.get('streamlit')
+    if st is not None:
+        getattr(st, level)(message)
+    elif level == 'error':
+        logger.error(message)
+    elif level == 'warning':
+        logger.warning(message)
+    else:
+        logger.info(message)
+
+
+@timed('load_data')
+def load_data(data_source, ticker, start_date=None, end_date=None, timeframe=None, columns=None):
     """
     Load data from either Yahoo Finance or local CSV files
+    timeframe (a config.TIMEFRAMES key) loads the local intraday file for
+    the ticker resampled to that bar size instead of the daily file.
+    columns keeps only those columns (e.g. config.COMPACT_COLUMNS).
     """
     
     if data_source == "Yahoo Finance (Live)":
         try:
-            import yfinance as yf
-            
             # Format dates
             start_str = start_date.strftime('%Y-%m-%d') if start_date else '2020-01-01'
             end_str = end_date.strftime('%Y-%m-%d') if end_date else '2024-01-01'
             
-            # Download data
-            df = yf.download(ticker, start=start_str, end=end_str, progress=False)
+            # Download data (only the dates not already in the local cache)
+            df = load_cached(ticker, start_str, end_str)
             
             if df.empty:
-                st.error(f"No data returned from Yahoo Finance for {ticker}")
+                _notify('error', f"No data returned from Yahoo Finance for {ticker}")
                 return None
             
-            # Handle multi-level columns (tuple issue)
-            if isinstance(df.columns, pd.MultiIndex):
-                # Flatten multi-index columns
-                df.columns = [col[0] for col in df.columns]
-            else:
-                # If not multi-index, just use as is
-                df.columns = [str(col).replace(f' {ticker}', '').replace(ticker, '').strip() for col in df.columns]
-            
-            # Ensure we have standard column names
-            column_mapping = {
-                'Open': 'Open',
-                'High': 'High',
-                'Low': 'Low',
-                'Close': 'Close', 
-                'Adj Close': 'Adj Close',
-                'Volume': 'Volume'
-            }
-            
-            # Create standardized columns
-            for std_col in column_mapping.values():
-                # Try to find matching column
-                for col in df.columns:
-                    if std_col.lower() in col.lower():
-                        df[std_col] = df[col]
-                        break
-            
-            # Ensure we have Adj Close (use Close if not available)
-            if 'Adj Close' not in df.columns:
-                if 'Close' in df.columns:
-                    df['Adj Close'] = df['Close']
-                else:
-                    # Try to find any price column
-                    price_cols = [col for col in df.columns if 'close' in col.lower() or 'price' in col.lower()]
-                    if price_cols:
-                        df['Adj Close'] = df[price_cols[0]]
-                    else:
-                        st.error("No price data found in Yahoo Finance response")
-                        return None
-            
-            # Keep only necessary columns
-            keep_cols = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
-            df = df[[col for col in keep_cols if col in df.columns]]
-            
-            st.success(f"✅ Loaded {len(df)} rows for {ticker}")
-            return df
+            _notify('success', f"✅ Loaded {len(df)} rows for {ticker}")
+            return df[columns] if columns else df
             
         except Exception as e:
-            st.error(f"Error loading from Yahoo Finance: {e}")
+            _notify('error', f"Error loading from Yahoo Finance: {e}")
             return None
     
     else:  # Local CSV Files
-        file_path = LOCAL_FILE_MAPPING.get(ticker)
+        if timeframe is None:
+            file_path = LOCAL_FILE_MAPPING.get(ticker)
+        else:
+            file_path = INTRADAY_FILE_MAPPING.get(ticker)
         if file_path and os.path.exists(file_path):
-            df = pd.read_csv(file_path, index_col=0, parse_dates=True)
-            
-            # Filter by date if provided
+            # Filter by date if provided (binary search on the cached index)
             if start_date and end_date:
-                df = df[(df.index >= pd.to_datetime(start_date)) & 
-                        (df.index <= pd.to_datetime(end_date))]
+                df = load_prices(file_path, start_date, end_date, timeframe=timeframe)
+            else:
+                df = load_prices(file_path, timeframe=timeframe)
             
             # Ensure we have Adj Close
             if 'Adj Close' not in df.columns:
@@ -91,7 +75,54 @@ def load_data(data_source, ticker, start_date=None, end_date=None):
                 elif 'Price' in df.columns:
                     df['Adj Close'] = df['Price']
             
-            return df
+            return df[columns] if columns else df
         else:
-            st.error(f"Local file not found: {file_path}")
+            _notify('error', f"Local file not found: {file_path}")
             return None
+
+
+def data_version(data_source, ticker, timeframe=None):
+    """
+    A version for keying caches of loaded data: the local file's mtime
+    and size, so an edited CSV is picked up, or today's date for Yahoo
+    Finance, so live data is fetched again at least once a day.
+    """
+    if data_source == "Yahoo Finance (Live)":
+        return date.today().isoformat()
+    file_path = (LOCAL_FILE_MAPPING if timeframe is None else INTRADAY_FILE_MAPPING).get(ticker)
+    if not file_path or not os.path.exists(file_path):
+        return None
+    stamp = source_stamp(file_path)
+    return stamp['mtime_ns'], stamp['size']
+
+
+def load_yahoo_pairs(tickers, start_date=None, end_date=None, columns=None):
+    """
+    Fetch many Yahoo Finance tickers concurrently (only the dates not
+    cached yet), returns {ticker: DataFrame}. Tickers that fail after the
+    retries are reported and left out.
+    """
+    start_str = start_date.strftime('%Y-%m-%d') if start_date else '2020-01-01'
+    end_str = end_date.strftime('%Y-%m-%d') if end_date else '2024-01-01'
+    frames, errors = load_many(tickers, start_str, end_str)
+    for ticker, message in errors.items():
+        _notify('warning', f"⚠️ {ticker}: {message}")
+    return {ticker: df[columns] if columns else df for ticker, df in frames.items()}
+
+
+def load_all_pairs(data_source=DATA_SOURCE_OPTIONS[1], pairs=None,
+                   start_date=None, end_date=None, timeframe=None, columns=None):
+    """
+    Load several pairs at once, returns {ticker: DataFrame}
+    pairs defaults to every pair of the source (YAHOO_PAIRS or LOCAL_PAIRS).
+    Pairs that fail to load are left out.
+    """
+    if data_source == "Yahoo Finance (Live)":
+        return load_yahoo_pairs(pairs or YAHOO_PAIRS, start_date, end_date, columns)
+
+    all_data = {}
+    for ticker in (pairs or LOCAL_PAIRS):
+        df = load_data(data_source, ticker, start_date, end_date, timeframe, columns)
+        if df is not None and not df.empty:
+            all_data[ticker] = df
+    return all_data
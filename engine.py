@@ -0,0 +1,110 @@
+# engine.py
+"""
+Headless backtest core: the app's pipeline without any UI imports.
+"""
+import numpy as np
+from config import COMPACT_COLUMNS
+from indicators import add_indicators
+from strategies import generate_signal, indicator_columns, indicator_param_names
+from metrics import PERIODS_PER_YEAR, calculate_metrics, calculate_market_return
+from profiling import timed
+
+_FLOAT32_MAX = np.finfo(np.float32).max
+
+
+def split_params(strategy, params):
+    """(indicator params, signal params) as sorted tuples, usable as cache keys"""
+    names = indicator_param_names(strategy)
+    indicator = tuple(sorted((k, v) for k, v in params.items() if k in names))
+    signal = tuple(sorted((k, v) for k, v in params.items() if k not in names))
+    return indicator, signal
+
+
+def downcast_columns(df, columns):
+    """
+    Store columns as float32; a column with values outside the float32
+    range stays float64. Returns the converted columns. float32 rounding
+    is within FLOAT32_TOLERANCE of each column's largest magnitude
+    (tests/test_compact.py).
+    """
+    converted = []
+    for col in columns:
+        values = df[col].to_numpy(dtype=float)
+        if np.nanmax(np.abs(values), initial=0) > _FLOAT32_MAX:
+            continue
+        df[col] = values.astype(np.float32)
+        converted.append(col)
+    return converted
+
+
+def drop_warmup(df):
+    """
+    Rows without NaN, like dropna. When the NaN rows are all at the start
+    (indicator warm-up, first return) the result is a slice of df instead
+    of a copy.
+    """
+    valid = df.notna().all(axis=1).to_numpy()
+    first = int(np.argmax(valid)) if valid.any() else len(df)
+    if valid[first:].all():
+        return df.iloc[first:]
+    return df[valid]
+
+
+@timed('add_returns', rows_from='arg')
+def add_returns(df, compact=False):
+    """
+    Market and strategy returns for a frame with a Signal column
+    (position follows the signal with 1 bar delay), cumulated from 1.
+    Rows with NaN (indicator warm-up, first return) are removed.
+    compact=True stores the position as int8 and drops the warm-up rows by
+    slicing (see drop_warmup); the results are the same.
+    """
+    df['Returns'] = df['Adj Close'].pct_change()
+    if compact:
+        # The first row has no return and is dropped either way
+        df['Position'] = df['Signal'].shift(1, fill_value=0).astype(np.int8)
+    else:
+        df['Position'] = df['Signal'].shift(1)
+    df['Strategy_Returns'] = df['Position'] * df['Returns']
+    df['Cumulative_Strategy'] = (1 + df['Strategy_Returns']).cumprod()
+    df['Cumulative_Market'] = (1 + df['Returns']).cumprod()
+    return drop_warmup(df) if compact else df.dropna()
+
+
+def split_train_test(df, split_ratio=70):
+    """Split rows into (train, test) with split_ratio percent in train (slices, not copies)"""
+    split_idx = int(len(df) * (split_ratio / 100))
+    return df.iloc[:split_idx], df.iloc[split_idx:]
+
+
+def prepare_backtest(df, strategy, cache=None, compact=False, **params):
+    """
+    Indicators, signals and returns for one pair; the input frame is modified
+    compact=True works on the COMPACT_COLUMNS only (the input is left
+    alone) and stores the indicators as float32 (downcast_columns),
+    after the signals have been computed from the float64 values.
+    """
+    if compact:
+        df = df[COMPACT_COLUMNS]
+    df = add_indicators(df, strategy, cache=cache, **params)
+    df['Signal'] = generate_signal(df, strategy, **params)
+    if compact:
+        downcast_columns(df, indicator_columns(strategy, **params))
+    return add_returns(df, compact=compact)
+
+
+def run_backtest(df, strategy, split_ratio=70, cache=None, metrics_fn=calculate_metrics,
+                 periods_per_year=PERIODS_PER_YEAR, compact=False, **params):
+    """
+    Run a backtest for one pair, returns (df, metrics) with metrics
+    {'train': ..., 'test': ..., 'market_return': ...}
+    periods_per_year annualizes the metrics (see metrics.periods_per_year).
+    compact=True keeps the working frame small (see prepare_backtest).
+    """
+    df = prepare_backtest(df if compact else df.copy(), strategy, cache=cache, compact=compact, **params)
+    train, test = split_train_test(df, split_ratio)
+    return df, {
+        'train': metrics_fn(train, periods_per_year=periods_per_year),
+        'test': metrics_fn(test, periods_per_year=periods_per_year),
+        'market_return': calculate_market_return(df)
+    }
@@ -0,0 +1,86 @@
+# indicator_cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from config import INDICATOR_CACHE_MAX_BYTES
+
+
+def price_key(price):
+    """Content hash of a price array, used as the data part of cache keys"""
+    price = np.ascontiguousarray(price, dtype=float)
+    digest = hashlib.blake2b(memoryview(price).cast('B'), digest_size=16)
+    digest.update(str(price.shape).encode())
+    return digest.hexdigest()
+
+
+def _nbytes(value):
+    if isinstance(value, tuple):
+        return sum(_nbytes(v) for v in value)
+    return getattr(value, 'nbytes', 0)
+
+
+def _freeze(value):
+    """Cached arrays are shared between callers, so make them read-only"""
+    if isinstance(value, tuple):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    return value
+
+
+class IndicatorCache:
+    """
+    LRU cache of indicator arrays keyed by (data hash, indicator, params),
+    bounded by the total size of the cached arrays.
+    """
+
+    def __init__(self, max_bytes=INDICATOR_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, data_key, name, params, compute):
+        """Return the cached value for the key, computing and storing it on a miss"""
+        key = (data_key, name, params)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        value = _freeze(compute())
+        size = _nbytes(value)
+
+        with self._lock:
+            self.misses += 1
+            if key not in self._entries and size <= self.max_bytes:
+                self._entries[key] = value
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= _nbytes(evicted)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._bytes
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+
+# Shared by everything in this process (Streamlit keeps imported modules between reruns)
+default_cache = IndicatorCache()
@@ -1,42 +1,106 @@
 # indicators.py
+from collections import Counter
+import numpy as np
 import pandas as pd
+from kernels import ewm_mean, rolling_gain_loss, rolling_mean_var
+from indicator_cache import price_key
+from profiling import timed
 
-def add_indicators(df, strategy, **kwargs):
+# Indicator name -> {'compute': fn(price, block, *args) -> {column: array}, 'columns': [...]}
+INDICATORS = {}
+
+
+def register_indicator(name, columns):
+    """
+    Decorator adding an indicator to INDICATORS. The function gets the
+    price array (1-D, or one column per series), a ``block(name, params,
+    compute)`` helper for cacheable building blocks, and its arguments.
+    """
+    def decorator(compute):
+        INDICATORS[name] = {'compute': compute, 'columns': list(columns)}
+        return compute
+    return decorator
+
+
+@register_indicator('rsi', ['RSI'])
+def rsi(price, block, period):
+    # RSI calculation (average gain and loss in one pass)
+    def compute():
+        avg_gain, avg_loss = rolling_gain_loss(price, period)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+    return {'RSI': block('rsi', (period,), compute)}
+
+
+@register_indicator('macd', ['MACD', 'MACD_signal'])
+def macd(price, block, fast, slow, signal):
+    ema_fast = block('ema', (fast,), lambda: ewm_mean(price, fast))
+    ema_slow = block('ema', (slow,), lambda: ewm_mean(price, slow))
+    line = ema_fast - ema_slow
+    return {'MACD': line,
+            'MACD_signal': block('macd_signal', (fast, slow, signal), lambda: ewm_mean(line, signal))}
+
+
+@register_indicator('bollinger', ['BB_middle', 'BB_upper', 'BB_lower'])
+def bollinger(price, block, period, num_std):
+    # Bollinger Bands (mean and variance in one pass)
+    middle, var = block('mean_var', (period,), lambda: rolling_mean_var(price, period))
+    band = np.sqrt(var) * num_std
+    return {'BB_middle': middle, 'BB_upper': middle + band, 'BB_lower': middle - band}
+
+
+def compute_indicators(price, requests, cache=None):
+    """
+    Indicator planner: compute each distinct (name, args) in ``requests``
+    once, however many strategies asked for it.
+    With an IndicatorCache, building blocks (EMAs, rolling mean/variance)
+    are looked up by price hash + parameters and shared between strategies.
+    Returns {(name, args): {column: array}}.
+    """
+    price = np.asarray(price, dtype=float)
+    if cache is None:
+        block = lambda name, params, compute: compute()
+    else:
+        data_key = price_key(price)
+        block = lambda name, params, compute: cache.get(data_key, name, params, compute)
+
+    results = {}
+    for name, args in requests:
+        key = (name, tuple(args))
+        if key not in results:
+            results[key] = INDICATORS[name]['compute'](price, block, *args)
+    return results
+
+
+def column_names(requests):
+    """
+    DataFrame column for each indicator output: the plain name ('RSI')
+    unless two requests produce the same column, then suffixed with the
+    args ('RSI_9', 'RSI_14'). Returns {(name, args): {column: frame column}}.
+    """
+    keys = list(dict.fromkeys((name, tuple(args)) for name, args in requests))
+    counts = Counter(col for name, _ in keys for col in INDICATORS[name]['columns'])
+    return {
+        (name, args): {col: col if counts[col] == 1 else '_'.join([col] + [str(a) for a in args])
+                       for col in INDICATORS[name]['columns']}
+        for name, args in keys
+    }
+
+
+@timed('add_indicators')
+def add_indicators(df, strategy, cache=None, **kwargs):
     """
     Add technical indicators to dataframe
+    (the indicators the strategy declares in the strategies registry)
     """
-    price = df["Adj Close"]
-    
-    if strategy == "RSI Strategy":
-        # RSI calculation
-        rsi_period = kwargs.get('rsi_period', 14)
-        delta = price.diff()
-        gain = delta.clip(lower=0)
-        loss = -delta.clip(upper=0)
-        avg_gain = gain.rolling(rsi_period).mean()
-        avg_loss = loss.rolling(rsi_period).mean()
-        rs = avg_gain / avg_loss
-        df["RSI"] = 100 - (100 / (1 + rs))
-    
-    elif strategy == "MACD Strategy":
-        # MACD calculation
-        macd_fast = kwargs.get('macd_fast', 12)
-        macd_slow = kwargs.get('macd_slow', 26)
-        macd_signal = kwargs.get('macd_signal', 9)
-        
-        ema_fast = price.ewm(span=macd_fast, adjust=False).mean()
-        ema_slow = price.ewm(span=macd_slow, adjust=False).mean()
-        df["MACD"] = ema_fast - ema_slow
-        df["MACD_signal"] = df["MACD"].ewm(span=macd_signal, adjust=False).mean()
-    
-    elif strategy == "Bollinger Strategy":
-        # Bollinger Bands calculation
-        boll_period = kwargs.get('boll_period', 20)
-        boll_std = kwargs.get('boll_std', 2)
-        
-        df["BB_middle"] = price.rolling(boll_period).mean()
-        bb_std = price.rolling(boll_period).std()
-        df["BB_upper"] = df["BB_middle"] + (bb_std * boll_std)
-        df["BB_lower"] = df["BB_middle"] - (bb_std * boll_std)
-    
+    from strategies import required_indicators
+
+    price = df["Adj Close"].to_numpy(dtype=float)
+    requests = list(required_indicators(strategy, **kwargs).values())
+    names = column_names(requests)
+    for key, columns in compute_indicators(price, requests, cache).items():
+        for column, values in columns.items():
+            df[names[key][column]] = values
     return df
@@ -0,0 +1,99 @@
+# intraday.py
+import numpy as np
+import pandas as pd
+from config import TIMEFRAMES
+
+OHLC_COLUMNS = ['Open', 'High', 'Low', 'Close']
+
+
+def _tick_prices(chunk):
+    """Open/High/Low/Close/Volume arrays from a chunk of bars or ticks"""
+    columns = {col.lower(): col for col in chunk.columns}
+    volume_col = columns.get('volume')
+    volume = (chunk[volume_col].to_numpy(dtype=float) if volume_col
+              else np.zeros(len(chunk)))
+
+    if all(col.lower() in columns for col in OHLC_COLUMNS):
+        return [chunk[columns[col.lower()]].to_numpy(dtype=float) for col in OHLC_COLUMNS] + [volume]
+
+    # Ticks: mid price from bid/ask, or a single price column
+    if 'bid' in columns and 'ask' in columns:
+        price = (chunk[columns['bid']].to_numpy(dtype=float) + chunk[columns['ask']].to_numpy(dtype=float)) / 2
+    else:
+        for name in ('price', 'last', 'mid', 'close', 'adj close'):
+            if name in columns:
+                price = chunk[columns[name]].to_numpy(dtype=float)
+                break
+        else:
+            raise ValueError(f"No price columns in {list(chunk.columns)}")
+    return [price, price, price, price, volume]
+
+
+def _aggregate(times, values, freq):
+    """
+    Bars for one sorted chunk: (bucket start times, [open, high, low, close, volume])
+    """
+    times = times.as_unit('ns')
+    if np.any(np.diff(times.asi8) < 0):
+        raise ValueError("Rows are not in time order")
+    buckets = times.floor(freq).asi8
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.append(starts[1:], len(buckets)) - 1
+    open_, high, low, close, volume = values
+    return buckets[starts], [
+        open_[starts],
+        np.maximum.reduceat(high, starts),
+        np.minimum.reduceat(low, starts),
+        close[ends],
+        np.add.reduceat(volume, starts)
+    ]
+
+
+def resample_csv(path, timeframe='5m', chunksize=1_000_000, **read_kwargs):
+    """
+    Read a large bar or tick CSV in chunks and resample it to ``timeframe``
+    (a key of config.TIMEFRAMES) as it streams, so only one chunk of raw
+    rows and the finished bars are in memory.
+
+    The first column is the timestamp and rows must be in time order.
+    Bars need Open/High/Low/Close columns; ticks need Bid and Ask or a
+    single Price/Last column. Volume is summed when present. Buckets with
+    no rows (weekends) are left out.
+    """
+    freq = TIMEFRAMES[timeframe]
+    parts = []
+    pending = None  # last bar of the previous chunk, may continue in the next one
+
+    for chunk in pd.read_csv(path, index_col=0, parse_dates=True, chunksize=chunksize, **read_kwargs):
+        values = _tick_prices(chunk)
+        keep = ~np.isnan(values[3])
+        if not keep.all():
+            chunk = chunk[keep]
+            values = [v[keep] for v in values]
+        if len(chunk) == 0:
+            continue
+
+        times, bars = _aggregate(pd.DatetimeIndex(chunk.index), values, freq)
+        if pending is not None:
+            if pending[0][0] > times[0]:
+                raise ValueError("Rows are not in time order")
+            if pending[0][0] == times[0]:
+                bars[0][0] = pending[1][0][0]
+                bars[1][0] = max(bars[1][0], pending[1][1][0])
+                bars[2][0] = min(bars[2][0], pending[1][2][0])
+                bars[4][0] += pending[1][4][0]
+            else:
+                parts.append(pending)
+        parts.append((times[:-1], [v[:-1] for v in bars]))
+        pending = (times[-1:], [v[-1:] for v in bars])
+
+    if pending is not None:
+        parts.append(pending)
+
+    times = np.concatenate([t for t, _ in parts]) if parts else np.array([], dtype=np.int64)
+    columns = [np.concatenate([bars[i] for _, bars in parts]) if parts else np.array([])
+               for i in range(5)]
+    df = pd.DataFrame(dict(zip(OHLC_COLUMNS + ['Volume'], columns)),
+                      index=pd.DatetimeIndex(times.astype('datetime64[ns]'), name='Date'))
+    df['Adj Close'] = df['Close']
+    return df[['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']]
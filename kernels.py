@@ -0,0 +1,165 @@
+# kernels.py
+import numpy as np
+import pandas as pd
+
+# Prefix sums restart every BLOCK_SIZE rows (or every window, if longer)
+BLOCK_SIZE = 4096
+# rolling_mean_var re-centres every ANCHOR_BLOCK_SIZE rows (or every window)
+ANCHOR_BLOCK_SIZE = 1024
+
+
+def _window_sums(x, window):
+    """
+    Sum of every length-`window` window along axis 0, for any number of
+    trailing dimensions. Row t holds x[t-window+1..t]; the first window-1
+    rows are NaN. Because the prefix sums restart every block, rounding
+    error depends on the block size and not on the series length.
+    x is used as scratch space and overwritten.
+    """
+    n = x.shape[0]
+    out = np.full(x.shape, np.nan)
+    if window > n:
+        return out
+
+    block = max(BLOCK_SIZE, window)
+    for start in range(0, n, block):
+        np.cumsum(x[start:start + block], axis=0, out=x[start:start + block])
+
+    out[window - 1] = x[window - 1]
+    np.subtract(x[window:], x[:n - window], out=out[window:])
+
+    # Windows that start in the previous block also need that block's total
+    for start in range(block, n, block):
+        out[start:start + window] += x[start - 1]
+    return out
+
+
+def _rolling_sums(channels, window, missing=None):
+    """
+    Window sums of several channels stacked on axis 1, in one pass.
+    Missing rows must already be zero in channels and `missing` must
+    broadcast against them; windows that contain one come back as NaN,
+    like pandas.
+    """
+    if window < 1:
+        raise ValueError("window must be an integer 1 or greater")
+    sums = _window_sums(channels, window)
+    if missing is not None and missing.any():
+        counts = np.cumsum(missing, axis=0)
+        in_window = counts[window - 1:].copy()
+        in_window[1:] -= counts[:len(counts) - window]
+        sums[window - 1:] = np.where(in_window > 0, np.nan, sums[window - 1:])
+    return sums
+
+
+def rolling_sum(x, window):
+    """Rolling sum over axis 0 of a 1-D or 2-D array"""
+    x = np.asarray(x, dtype=float)
+    missing = np.isnan(x)[:, None]
+    return _rolling_sums(np.where(missing, 0.0, x[:, None]), window, missing)[:, 0]
+
+
+def rolling_mean(x, window):
+    """Rolling mean over axis 0 of a 1-D or 2-D array"""
+    return rolling_sum(x, window) / window
+
+
+def _flat_windows(x, window):
+    """Rows window-1.. of x: True where the window holds one repeated value"""
+    changes = np.zeros(x.shape, dtype=np.int64)
+    np.not_equal(x[1:], x[:-1], out=changes[1:], casting='unsafe')
+    np.cumsum(changes, axis=0, out=changes)
+    return changes[window - 1:] == changes[:len(changes) - window + 1]
+
+
+def rolling_mean_var(x, window, ddof=1):
+    """
+    Rolling mean and variance over axis 0, from one pass over the data.
+    Rows are done in blocks of ANCHOR_BLOCK_SIZE, each centred on the mean
+    of the values its windows cover, so the sum of squares doesn't cancel
+    against the squared sum even when the series drifts far from its
+    overall level. Windows where the value doesn't change get exactly that
+    value as the mean and 0 as the variance.
+    """
+    if window < 1:
+        raise ValueError("window must be an integer 1 or greater")
+    x = np.asarray(x, dtype=float)
+    mean = np.full(x.shape, np.nan)
+    var = np.full(x.shape, np.nan)
+    if window > len(x):
+        return mean, var
+
+    block = max(ANCHOR_BLOCK_SIZE, window)
+    for start in range(window - 1, len(x), block):
+        stop = min(start + block, len(x))
+        _anchored_mean_var(x[start - window + 1:stop], window, ddof, mean[start:stop], var[start:stop])
+
+    # Exact results where the window holds one repeated value
+    flat = _flat_windows(x, window) & ~np.isnan(mean[window - 1:])
+    mean[window - 1:][flat] = x[window - 1:][flat]
+    if window - ddof > 0:
+        var[window - 1:][flat] = 0.0
+    return mean, var
+
+
+def _anchored_mean_var(x, window, ddof, mean, var):
+    """Mean and variance of the windows ending at rows window-1.. of x, written to mean / var"""
+    missing = np.isnan(x)
+    has_missing = missing.any()
+    if has_missing:
+        present = (~missing).sum(axis=0)
+        anchor = np.where(missing, 0.0, x).sum(axis=0) / np.maximum(present, 1)
+    else:
+        anchor = x.mean(axis=0)
+
+    channels = np.empty(x.shape[:1] + (2,) + x.shape[1:])
+    centred = channels[:, 0]
+    np.subtract(x, anchor, out=centred)
+    centred[missing] = 0.0
+    np.multiply(centred, centred, out=channels[:, 1])
+
+    sums = _rolling_sums(channels, window, missing[:, None] if has_missing else None)[window - 1:]
+    np.divide(sums[:, 0], window, out=mean)
+    if window - ddof > 0:
+        np.multiply(sums[:, 0], mean, out=var)
+        np.subtract(sums[:, 1], var, out=var)
+        np.maximum(var, 0.0, out=var)
+        var /= window - ddof
+    mean += anchor
+
+
+def rolling_gain_loss(x, window):
+    """
+    Rolling average gain and average loss of the bar-to-bar changes of x,
+    both from one pass. Like price.diff(), the first row has no change.
+    """
+    x = np.asarray(x, dtype=float)
+    gain_loss = np.empty(x.shape[:1] + (2,) + x.shape[1:])
+    delta = gain_loss[1:, 1]
+    np.subtract(x[1:], x[:-1], out=delta)
+    missing = np.isnan(delta)
+    delta[missing] = 0.0
+    np.maximum(delta, 0.0, out=gain_loss[1:, 0])
+    np.minimum(delta, 0.0, out=delta)
+    np.negative(delta, out=delta)
+
+    avg = np.full(gain_loss.shape, np.nan)
+    avg[1:] = _rolling_sums(gain_loss[1:], window, missing[:, None]) / window
+    return avg[:, 0], avg[:, 1]
+
+
+def ewm_mean(x, span):
+    """
+    EMA with adjust=False over axis 0. `span` is a number or, for a 2-D
+    array, one span per column; columns sharing a span are done together.
+    """
+    x = np.asarray(x, dtype=float)
+    if np.ndim(span) == 0:
+        return pd.DataFrame(x.reshape(len(x), -1)).ewm(span=span, adjust=False).mean().to_numpy().reshape(x.shape)
+
+    spans = np.asarray(span, dtype=float)
+    out = np.empty(x.shape)
+    for value in np.unique(spans):
+        cols = np.flatnonzero(spans == value)
+        out[:, cols] = pd.DataFrame(x[:, cols]).ewm(span=value, adjust=False).mean().to_numpy()
+    return out
@@ -1,8 +1,162 @@
 # metrics.py
 import pandas as pd
 import numpy as np
+from config import TIMEFRAMES
+from profiling import timed
 
-def calculate_metrics(data):
+PERIODS_PER_YEAR = 252
+
+# Keys of the dict returned by calculate_returns_metrics
+RETURNS_METRIC_KEYS = ['total_return', 'annual_return', 'sharpe', 'sortino', 'max_drawdown',
+                       'max_drawdown_duration', 'calmar', 'win_rate', 'profit_factor', 'exposure',
+                       'round_trips']
+# Of those, the metrics where smaller is better (the rest rank highest first)
+LOWER_IS_BETTER = {'max_drawdown_duration'}
+
+
+def periods_per_year(timeframe=None):
+    """Bars per year for a config.TIMEFRAMES key (daily when None), FX trades around the clock"""
+    if timeframe is None:
+        return PERIODS_PER_YEAR
+    return PERIODS_PER_YEAR * (pd.Timedelta('1D') / pd.Timedelta(TIMEFRAMES[timeframe]))
+
+
+def accumulate(ufunc, a):
+    """
+    ufunc.accumulate down the rows of a 2-D array (running peaks, growth,
+    last seen row ...). NumPy's strided axis-0 accumulate is slow on 2-D
+    arrays, so wide arrays step one vectorised row at a time and narrow
+    ones are accumulated column-major.
+    """
+    if a.shape[1] >= 128:
+        out = np.empty_like(a)
+        if len(a):
+            out[0] = a[0]
+        for i in range(1, len(a)):
+            ufunc(out[i - 1], a[i], out=out[i])
+        return out
+    if a.shape[1] > 1:
+        a = np.asfortranarray(a)
+    return ufunc.accumulate(a, axis=0)
+
+
+def calculate_returns_metrics(returns, positions=None, mask=None, periods_per_year=PERIODS_PER_YEAR):
+    """
+    All performance metrics from a returns array in one pass.
+
+    returns is 1-D (one run) or 2-D (one column per run). positions, if
+    given, is the position held on each bar (same shape); without it a
+    run of non-zero returns counts as one position. mask selects the rows
+    that belong to each column (e.g. a train/test slice); other rows are
+    treated as if they weren't there. 1-D input gives a dict of numbers,
+    2-D input a dict of arrays.
+    """
+    returns = np.asarray(returns, dtype=float)
+    one_run = returns.ndim == 1
+    if one_run:
+        returns = returns[:, None]
+    if len(returns) == 0:
+        returns = np.full((1, returns.shape[1]), np.nan)
+    present = ~np.isnan(returns)
+    if mask is not None:
+        present &= mask.reshape(returns.shape)
+    r = np.where(present, returns, 0.0)
+    n_rows = present.sum(axis=0)
+    n = np.maximum(n_rows, 1)
+
+    if positions is None:
+        held = r != 0
+        positions = held.astype(np.int8)
+    else:
+        positions = np.asarray(positions).reshape(returns.shape)
+        held = (positions != 0) & present
+
+    # Each column's rows form one block (the usual slice case) unless there are gaps
+    rows = np.arange(len(r))[:, None]
+    first = np.argmax(present, axis=0)
+    last = len(r) - 1 - np.argmax(present[::-1], axis=0)
+    contiguous = bool(np.all((n_rows == 0) | (last - first + 1 == n_rows)))
+
+    # Growth of 1 unit and drawdown from the running peak (starting capital counts as a peak)
+    equity = accumulate(np.multiply, 1 + r)
+    peak = np.maximum(accumulate(np.maximum, equity), 1.0)
+    at_peak = equity >= peak
+    max_drawdown = (equity / peak - 1).min(axis=0) * 100
+
+    # Longest stretch under water, counted in bars that belong to the column
+    clock = rows if contiguous else accumulate(np.add, present.astype(np.int64))
+    last_peak = accumulate(np.maximum, np.where(at_peak, clock, -1 if contiguous else 0))
+    underwater = np.where(present, clock - last_peak, 0)
+    max_drawdown_duration = underwater.max(axis=0)
+
+    total_growth = equity[-1] if len(equity) else np.ones(r.shape[1])
+    total_return = (total_growth - 1) * 100
+    years = n / periods_per_year
+    annual_return = (np.power(np.maximum(total_growth, 0.0), 1 / years) - 1) * 100
+
+    # Sharpe / Sortino (sample std, like pandas)
+    mean = r.sum(axis=0) / n
+    deviation = r - mean
+    deviation[~present] = 0.0
+    var = np.einsum('ij,ij->j', deviation, deviation) / np.maximum(n_rows - 1, 1)
+    std = np.sqrt(var)
+    gains = np.maximum(r, 0.0)
+    losses = np.minimum(r, 0.0)
+    downside = np.sqrt(np.einsum('ij,ij->j', losses, losses) / n)
+    scale = np.sqrt(periods_per_year)
+    sharpe = np.divide(scale * mean, std, out=np.zeros_like(mean), where=std > 0)
+    sortino = np.divide(scale * mean, downside, out=np.zeros_like(mean), where=downside > 0)
+    calmar = np.divide(annual_return, -max_drawdown, out=np.zeros_like(mean), where=max_drawdown < 0)
+
+    # Win rate calculated ONLY on active trading days
+    active_days = np.count_nonzero(r, axis=0)
+    winning_days = np.count_nonzero(gains, axis=0)
+    win_rate = np.divide(winning_days * 100.0, active_days, out=np.zeros(len(n)), where=active_days > 0)
+
+    gross_profit = gains.sum(axis=0)
+    gross_loss = -losses.sum(axis=0)
+    profit_factor = np.where(gross_profit > 0, np.inf, 0.0)
+    np.divide(gross_profit, gross_loss, out=profit_factor, where=gross_loss > 0)
+
+    # A round trip starts whenever a position is opened or flipped,
+    # compared with the previous bar that belongs to the column
+    if contiguous:
+        prev_positions = np.zeros(positions.shape, dtype=positions.dtype)
+        prev_positions[1:] = positions[:-1]
+        prev_positions[first, np.arange(r.shape[1])] = 0
+    else:
+        last_present = accumulate(np.maximum, np.where(present, rows, -1))
+        prev_present = np.full(r.shape, -1)
+        prev_present[1:] = last_present[:-1]
+        prev_positions = np.take_along_axis(positions, np.maximum(prev_present, 0), axis=0)
+        prev_positions[prev_present < 0] = 0
+    round_trips = (held & (positions != prev_positions)).sum(axis=0)
+
+    exposure = held.sum(axis=0) / n * 100
+
+    empty = n_rows == 0
+    results = {
+        'total_return': total_return,
+        'annual_return': annual_return,
+        'sharpe': sharpe,
+        'sortino': sortino,
+        'max_drawdown': max_drawdown,
+        'max_drawdown_duration': max_drawdown_duration,
+        'calmar': calmar,
+        'win_rate': win_rate,
+        'profit_factor': profit_factor,
+        'exposure': exposure,
+        'round_trips': round_trips
+    }
+    for key, values in results.items():
+        results[key] = np.where(empty, 0, values)
+    if one_run:
+        return {key: values[0].item() for key, values in results.items()}
+    return results
+
+
+@timed('calculate_metrics', rows_from='arg')
+def calculate_metrics(data, periods_per_year=PERIODS_PER_YEAR):
     """
     Calculate performance metrics from strategy returns
     """
@@ -12,29 +166,27 @@ def calculate_metrics(data):
             'win_rate': 0.0,
             'trades': 0
         }
-    
+
+    # Position held on each bar (the previous bar's signal). Without a
+    # Position column the first bar of a slice can't see it and counts as flat
+    signals = data['Signal'].to_numpy()
+    if 'Position' in data.columns:
+        positions = data['Position'].to_numpy()
+    else:
+        positions = np.zeros(len(signals), dtype=signals.dtype)
+        positions[1:] = signals[:-1]
+
+    metrics = calculate_returns_metrics(data['Strategy_Returns'].to_numpy(), positions,
+                                        periods_per_year=periods_per_year)
+
     # Total return as percentage
     if 'Cumulative_Strategy' in data.columns:
-        total_return = (data['Cumulative_Strategy'].iloc[-1] - 1) * 100
-    else:
-        total_return = ((1 + data['Strategy_Returns']).prod() - 1) * 100
-    
-    # Win rate calculated ONLY on active trading days
-    active_days = data[data['Strategy_Returns'] != 0]
-    if len(active_days) > 0:
-        winning_days = (active_days['Strategy_Returns'] > 0).sum()
-        win_rate = (winning_days / len(active_days) * 100)
-    else:
-        win_rate = 0.0
-    
+        metrics['total_return'] = (data['Cumulative_Strategy'].iloc[-1] - 1) * 100
+
     # Number of trades (days with signal changes)
-    trades = (data['Signal'] != 0).sum()
-    
-    return {
-        'total_return': total_return,
-        'win_rate': win_rate,
-        'trades': trades
-    }  # <-- Closing bracket added here
+    metrics['trades'] = int((signals != 0).sum())
+
+    return metrics
 
 def calculate_market_return(data):
     """Calculate buy and hold return"""
@@ -44,3 +196,34 @@ def calculate_market_return(data):
         return (data['Cumulative_Market'].iloc[-1] - 1) * 100
     else:
         return ((1 + data['Returns']).prod() - 1) * 100
+
+def calculate_metrics_batch(strategy_returns, signals, cumulative_strategy=None, mask=None,
+                            positions=None, periods_per_year=PERIODS_PER_YEAR):
+    """
+    Calculate calculate_metrics for many runs at once.
+
+    All inputs are 2-D arrays with one column per run. ``mask`` selects the
+    rows each column would keep (after dropna / train-test slicing); the
+    result is a dict of 1-D arrays with the same keys as calculate_metrics.
+    ``positions`` defaults to the signals lagged by one row.
+    """
+    strategy_returns = np.asarray(strategy_returns, dtype=float)
+    signals = np.asarray(signals)
+    if mask is None:
+        mask = ~np.isnan(strategy_returns)
+
+    if positions is None:
+        positions = np.zeros(signals.shape, dtype=signals.dtype)
+        positions[1:] = signals[:-1]
+    metrics = calculate_returns_metrics(strategy_returns, positions, mask, periods_per_year)
+
+    # Total return as percentage
+    if cumulative_strategy is not None:
+        last_row = mask.shape[0] - 1 - np.argmax(mask[::-1], axis=0)
+        last_value = cumulative_strategy[last_row, np.arange(mask.shape[1])]
+        metrics['total_return'] = np.where(mask.any(axis=0), (last_value - 1) * 100, 0.0)
+
+    # Number of trades (days with signal changes)
+    metrics['trades'] = (mask & (signals != 0)).sum(axis=0)
+
+    return metrics
@@ -0,0 +1,262 @@
+# paper_trading.py
+"""
+Paper trading: feed bars one at a time through the registered strategy
+rules and track each pair's position and P&L, all pairs in one asyncio
+process.
+
+    python paper_trading.py --strategy "RSI Strategy" --speed 0 --events events.jsonl
+
+Indicators are kept incrementally per pair (streaming.py), so history is
+never reloaded; each bar's decision runs the strategy's rule from the
+strategies registry on the last few bars (the strategy's lookback). As in
+the backtests, the position follows the signal with a 1-bar delay.
+Bars come from replaying the local CSVs (replay_frame), from tailing a
+growing CSV (tail_csv), or from any async iterable of (time, bar).
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import math
+import os
+import sys
+import time
+from array import array
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from config import DATA_SOURCE_OPTIONS, LOCAL_PAIRS
+from data_loader import load_data
+from indicators import column_names
+from streaming import bar_price, streaming_indicator
+from strategies import STRATEGIES, required_indicators, resolve_params
+
+logger = logging.getLogger(__name__)
+
+
+class PairTrader:
+    """
+    Incremental state for one pair: streaming indicators, the last
+    ``lookback`` bars, position and equity (growth of 1 unit). on_bar
+    returns the events for a bar:
+
+    {'event': 'bar', 'pair', 'time', 'price', 'signal', 'position', 'pnl', 'equity', 'latency_us'}
+    {'event': 'trade', 'pair', 'time', 'price', 'from', 'to'} when the position changes
+
+    hold=True carries each signal forward until the next one (see
+    simulator.hold_signals); cost is charged per unit of position change
+    in price units (see simulator.position_returns).
+    """
+
+    def __init__(self, pair, strategy, hold=False, cost=0.0, **params):
+        self.pair = pair
+        self.hold = hold
+        self.cost = cost
+        self.params = resolve_params(strategy, params)
+        self.rule = STRATEGIES[strategy]['rule']
+        self.indicator = streaming_indicator(strategy, **self.params)
+        needed = required_indicators(strategy, **self.params)
+        names = column_names(needed.values())
+        self.columns = {local: names[(name, tuple(args))] for local, (name, args) in needed.items()}
+
+        # The bars the rule looks at: prices and indicator values
+        lookback = STRATEGIES[strategy]['lookback']
+        self.prices = deque(maxlen=lookback)
+        self.history = deque(maxlen=lookback)
+        self.prev_price = math.nan
+        self.signal = 0
+        self.position = 0  # held over the next bar
+        self.last_held = 0
+        self.equity = 1.0
+        self.bars = 0
+        self.trades = 0
+        self.latencies = array('d')
+
+    def decide(self):
+        """Signal for the latest bar: the strategy rule on the bars kept"""
+        ind = {local: {col: np.array([values[frame_col] for values in self.history])
+                       for col, frame_col in cols.items()}
+               for local, cols in self.columns.items()}
+        buy, sell = self.rule(np.array(self.prices), ind, self.params)
+        return -1 if sell[-1] else 1 if buy[-1] else 0
+
+    def on_bar(self, when, bar):
+        started = time.perf_counter()
+        price = bar_price(bar)
+
+        # P&L of the position held over this bar
+        held = self.position
+        pnl = held * (price / self.prev_price - 1) if self.bars else math.nan
+        if self.bars and self.cost and held != self.last_held:
+            pnl -= abs(held - self.last_held) * self.cost / self.prev_price
+        if self.bars:
+            self.equity *= 1 + pnl
+        self.last_held = held
+
+        # Decision for the next bar
+        self.prices.append(price)
+        self.history.append(self.indicator.update(price))
+        self.signal = self.decide()
+        if self.signal != 0 or not self.hold:
+            self.position = self.signal
+        latency = (time.perf_counter() - started) * 1e6
+        self.latencies.append(latency)
+
+        self.prev_price = price
+        self.bars += 1
+
+        events = [{'event': 'bar', 'pair': self.pair, 'time': when, 'price': price, 'signal': self.signal,
+                   'position': self.position, 'pnl': pnl, 'equity': self.equity, 'latency_us': latency}]
+        if self.position != held:
+            self.trades += 1
+            events.append({'event': 'trade', 'pair': self.pair, 'time': when, 'price': price,
+                           'from': held, 'to': self.position})
+        return events
+
+    def summary(self):
+        latencies = np.frombuffer(self.latencies, dtype=float) if len(self.latencies) else np.full(1, np.nan)
+        return {
+            'pair': self.pair,
+            'bars': self.bars,
+            'trades': self.trades,
+            'total_return': (self.equity - 1) * 100,
+            'position': self.position,
+            'latency_p50_us': float(np.percentile(latencies, 50)),
+            'latency_p99_us': float(np.percentile(latencies, 99)),
+            'latency_max_us': float(latencies.max())
+        }
+
+
+# ==============================
+# Bar sources: async iterables of (time, bar)
+# ==============================
+async def replay_frame(df, speed=None, batch=256):
+    """
+    Replay a price frame bar by bar. speed is in bars per second (paced
+    against the loop clock, so it doesn't drift); None or 0 replays as fast
+    as possible, yielding to the other pairs every ``batch`` bars.
+    """
+    prices = df['Adj Close'].to_numpy(dtype=float)
+    times = df.index.to_numpy()
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for i in range(len(prices)):
+        if speed:
+            delay = start + i / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        elif i % batch == 0:
+            await asyncio.sleep(0)
+        yield times[i], prices[i]
+
+
+async def tail_csv(path, poll=1.0, price_column='Adj Close'):
+    """
+    Follow a CSV that is being appended to (like tail -f): yield the rows
+    already in it, then new rows as they are written. Runs until cancelled.
+    """
+    with open(path, newline='') as f:
+        header = next(csv.reader([f.readline()]))
+        column = header.index(price_column if price_column in header else 'Close')
+        pending = ''
+        while True:
+            line = f.readline()
+            if not line:
+                await asyncio.sleep(poll)
+                continue
+            pending += line
+            if not pending.endswith('\n'):
+                continue  # the writer hasn't finished this row yet
+            row = next(csv.reader([pending]))
+            pending = ''
+            if row and row[column]:
+                yield pd.Timestamp(row[0]), float(row[column])
+
+
+# ==============================
+# Service
+# ==============================
+async def _trade(trader, source, emit):
+    async for when, bar in source:
+        for event in trader.on_bar(when, bar):
+            emit(event)
+
+
+async def run_paper_trading(sources, strategy, emit=None, hold=False, cost=0.0, **params):
+    """
+    Trade every pair's bar source concurrently until the sources end.
+    sources: {pair: async iterable of (time, bar)}; emit(event) receives
+    every event. Returns {pair: summary}. Each summary is also emitted as
+    {'event': 'summary', ...}, including when the task is cancelled (the
+    cancellation is then re-raised).
+    """
+    emit = emit or (lambda event: None)
+    traders = {pair: PairTrader(pair, strategy, hold=hold, cost=cost, **params) for pair in sources}
+    try:
+        await asyncio.gather(*(_trade(traders[pair], source, emit) for pair, source in sources.items()))
+    finally:
+        summaries = {pair: trader.summary() for pair, trader in traders.items()}
+        for summary in summaries.values():
+            emit({'event': 'summary', **summary})
+    return summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Paper trade the local pairs by replaying their bars")
+    parser.add_argument('--strategy', default="RSI Strategy")
+    parser.add_argument('--params', default='{}', help="strategy params as JSON")
+    parser.add_argument('--pairs', nargs='+', default=LOCAL_PAIRS)
+    parser.add_argument('--timeframe', help="replay the intraday files at this bar size (1m, 5m, ...)")
+    parser.add_argument('--speed', type=float, default=0, help="bars per second per pair (0: as fast as possible)")
+    parser.add_argument('--hold', action='store_true', help="hold positions between signals")
+    parser.add_argument('--cost', type=float, default=0.0,
+                        help="cost per unit of position change, in price units")
+    parser.add_argument('--tail', action='store_true', help="follow the CSV files for new rows instead")
+    parser.add_argument('--events', help="write the trade events (or all events with --all-events) as JSON lines")
+    parser.add_argument('--all-events', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    if args.tail:
+        from config import INTRADAY_FILE_MAPPING, LOCAL_FILE_MAPPING
+        mapping = INTRADAY_FILE_MAPPING if args.timeframe else LOCAL_FILE_MAPPING
+        sources = {pair: tail_csv(mapping[pair]) for pair in args.pairs if os.path.exists(mapping[pair])}
+    else:
+        sources = {}
+        for pair in args.pairs:
+            df = load_data(DATA_SOURCE_OPTIONS[1], pair, timeframe=args.timeframe)
+            if df is not None and not df.empty:
+                sources[pair] = replay_frame(df, args.speed)
+
+    out = open(args.events, 'w') if args.events else None
+    summaries = {}
+
+    def emit(event):
+        if event['event'] == 'summary':
+            summaries[event['pair']] = {k: v for k, v in event.items() if k != 'event'}
+        if out is not None and (args.all_events or event['event'] == 'trade'):
+            out.write(json.dumps(event, default=str) + '\n')
+
+    started = time.perf_counter()
+    try:
+        asyncio.run(run_paper_trading(sources, args.strategy, emit, hold=args.hold, cost=args.cost,
+                                      **json.loads(args.params)))
+    except KeyboardInterrupt:
+        pass  # the summaries up to the interrupt are still reported
+    finally:
+        if out is not None:
+            out.close()
+    elapsed = time.perf_counter() - started
+
+    table = pd.DataFrame(summaries.values())
+    table.to_csv(sys.stdout, index=False)
+    bars = table['bars'].sum() if len(table) else 0
+    logging.info("%d bars in %.2fs (%.0f bars/s)", bars, elapsed, bars / elapsed if elapsed else 0)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
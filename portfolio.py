@@ -0,0 +1,108 @@
+# portfolio.py
+import numpy as np
+import pandas as pd
+from kernels import rolling_mean_var
+from metrics import PERIODS_PER_YEAR, calculate_returns_metrics
+from simulator import hold_signals, lag_positions
+from strategies import compute_signals
+from profiling import timed
+
+
+def build_panel(data, column='Adj Close'):
+    """
+    Align several pairs into one date x pair array.
+
+    data is {pair: DataFrame}. Rows are the union of all dates; a pair's
+    missing bars inside its history are filled with its last price (no
+    return on that bar), bars before its first price stay NaN.
+    Returns (index, pairs, price, observed) where observed marks the bars
+    each pair actually traded.
+    """
+    pairs = list(data)
+    frame = pd.concat({pair: data[pair][column] for pair in pairs}, axis=1).sort_index()
+    frame = frame[~frame.index.duplicated(keep='last')]
+    observed = frame.notna().to_numpy()
+    price = frame.ffill().to_numpy(dtype=float)
+    return frame.index, pairs, price, observed
+
+
+def panel_signals(price, strategy, **kwargs):
+    """
+    Signals for every column of a price panel in one pass, with the same
+    parameters and rules as add_indicators + generate_signal.
+    """
+    return compute_signals(price, strategy, **kwargs)
+
+
+def portfolio_weights(returns, positions, weighting='equal', target_vol=0.10, vol_window=20,
+                      max_leverage=2.0, periods_per_year=PERIODS_PER_YEAR):
+    """
+    Capital weight of each pair on each bar.
+
+    'equal' splits capital over the pairs that have prices on the bar.
+    'vol_target' scales each pair to target_vol (annualised) from the
+    rolling volatility known at the previous close, then splits over the
+    pairs; the total gross weight is capped at max_leverage.
+    """
+    active = ~np.isnan(returns)
+    n_active = np.maximum(active.sum(axis=1, keepdims=True), 1)
+    if weighting == 'equal':
+        return np.where(active, 1.0 / n_active, 0.0)
+    if weighting != 'vol_target':
+        raise ValueError(f"Unknown weighting: {weighting}")
+
+    _, var = rolling_mean_var(returns, vol_window)
+    vol = np.full(returns.shape, np.nan)
+    vol[1:] = np.sqrt(var[:-1] * periods_per_year)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weights = np.where(active & (vol > 0), target_vol / vol, 0.0) / n_active
+    gross = np.abs(weights * (positions != 0)).sum(axis=1, keepdims=True)
+    return weights * np.minimum(1.0, max_leverage / np.maximum(gross, 1e-12))
+
+
+@timed('run_portfolio')
+def run_portfolio(data, strategy, weighting='equal', split_ratio=70, hold=False, target_vol=0.10,
+                  vol_window=20, max_leverage=2.0, periods_per_year=PERIODS_PER_YEAR, **params):
+    """
+    Backtest one strategy on several pairs at once and combine them.
+
+    All pairs are aligned into one panel and indicators, signals and
+    positions (previous bar's signal) are computed for every column
+    together. Returns a dict with the portfolio 'returns' and 'equity',
+    per-pair strategy returns ('pair_returns'), the 'weights', the
+    'correlation' of the pairs' returns and train/test 'metrics'.
+    """
+    index, pairs, price, observed = build_panel(data)
+
+    signals = panel_signals(price, strategy, **params)
+    positions = lag_positions(hold_signals(signals) if hold else signals)
+
+    returns = np.full(price.shape, np.nan)
+    returns[1:] = price[1:] / price[:-1] - 1
+    pair_returns = positions * returns
+
+    weights = portfolio_weights(returns, positions, weighting, target_vol, vol_window, max_leverage,
+                                periods_per_year)
+    portfolio = np.nansum(weights * pair_returns, axis=1)
+    portfolio[0] = 0.0
+
+    split_idx = int(len(index) * (split_ratio / 100))
+    invested = (positions != 0).any(axis=1).astype(np.int8)
+    metrics = {
+        'train': calculate_returns_metrics(portfolio[:split_idx], invested[:split_idx],
+                                           periods_per_year=periods_per_year),
+        'test': calculate_returns_metrics(portfolio[split_idx:], invested[split_idx:],
+                                          periods_per_year=periods_per_year)
+    }
+
+    # Correlation over the bars each pair of pairs actually traded together
+    market = pd.DataFrame(np.where(observed, returns, np.nan), index=index, columns=pairs)
+    portfolio_returns = pd.Series(portfolio, index=index, name='Strategy_Returns')
+    return {
+        'returns': portfolio_returns,
+        'equity': (1 + portfolio_returns).cumprod().rename('Cumulative_Strategy'),
+        'pair_returns': pd.DataFrame(pair_returns, index=index, columns=pairs),
+        'weights': pd.DataFrame(weights, index=index, columns=pairs),
+        'correlation': market.corr(),
+        'metrics': metrics
+    }
@@ -0,0 +1,138 @@
+# price_store.py
+import json
+import os
+import numpy as np
+import pandas as pd
+from config import PRICE_CACHE_DIR
+from intraday import resample_csv
+
+# Memory-mapped stores already opened by this process: store dir -> (meta, index, columns)
+_open_stores = {}
+
+
+def _store_dir(csv_path, cache_dir, timeframe=None):
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    if timeframe is not None:
+        name += f'_{timeframe}'
+    return os.path.join(cache_dir, name)
+
+
+def source_stamp(csv_path):
+    """{'mtime_ns', 'size'} of a CSV; a store is rebuilt when its source's stamp changes"""
+    stat = os.stat(csv_path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def _save_atomic(path, array):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _read_meta(store):
+    try:
+        with open(os.path.join(store, 'meta.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_store(csv_path, cache_dir=PRICE_CACHE_DIR, timeframe=None):
+    """
+    Convert a price CSV into a columnar store: one .npy file per numeric
+    column, a datetime64[ns] index file and meta.json (written last).
+    With a timeframe the CSV (bars or ticks) is resampled while it is read.
+    """
+    stamp = source_stamp(csv_path)
+    if timeframe is None:
+        df = pd.read_csv(csv_path, index_col=0, parse_dates=True)
+        df = df.sort_index(kind='stable')
+    else:
+        df = resample_csv(csv_path, timeframe)
+
+    store = _store_dir(csv_path, cache_dir, timeframe)
+    os.makedirs(store, exist_ok=True)
+
+    columns = []
+    for i, col in enumerate(df.columns):
+        values = df[col].to_numpy()
+        if values.dtype == object:
+            continue  # only numeric columns are stored
+        file_name = f'col{i}.npy'
+        _save_atomic(os.path.join(store, file_name), values)
+        columns.append({'name': col, 'file': file_name})
+
+    _save_atomic(os.path.join(store, 'index.npy'), df.index.to_numpy(dtype='datetime64[ns]'))
+
+    meta = {
+        'source': os.path.abspath(csv_path),
+        'stamp': stamp,
+        'timeframe': timeframe,
+        'index_name': df.index.name,
+        'columns': columns
+    }
+    tmp_path = os.path.join(store, 'meta.json.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, os.path.join(store, 'meta.json'))
+    return meta
+
+
+def open_store(csv_path, cache_dir=PRICE_CACHE_DIR, timeframe=None):
+    """
+    Return (meta, index, columns) for a CSV, memory-mapped read-only.
+    The store is (re)built when missing or when the CSV's mtime/size changed.
+    """
+    store = _store_dir(csv_path, cache_dir, timeframe)
+    stamp = source_stamp(csv_path)
+
+    cached = _open_stores.get(store)
+    if cached is not None and cached[0]['stamp'] == stamp:
+        return cached
+
+    meta = _read_meta(store)
+    if meta is None or meta['stamp'] != stamp:
+        meta = build_store(csv_path, cache_dir, timeframe)
+
+    index = np.load(os.path.join(store, 'index.npy'), mmap_mode='r')
+    columns = {col['name']: np.load(os.path.join(store, col['file']), mmap_mode='r')
+               for col in meta['columns']}
+    _open_stores[store] = (meta, index, columns)
+    return _open_stores[store]
+
+
+def close_stores(cache_dir=None):
+    """
+    Forget the memory-mapped stores this process has open (only those
+    under cache_dir, if given), so their files can be removed. Frames
+    already loaded keep their own references.
+    """
+    prefix = None if cache_dir is None else os.path.join(os.path.abspath(cache_dir), '')
+    for store in list(_open_stores):
+        if prefix is None or os.path.abspath(store).startswith(prefix):
+            del _open_stores[store]
+
+
+def load_prices(csv_path, start_date=None, end_date=None, cache_dir=PRICE_CACHE_DIR, timeframe=None):
+    """
+    Load a price CSV through the columnar store.
+    Dates are inclusive; the range is found with a binary search on the
+    index and the returned frame is a view on the memory-mapped columns.
+    timeframe (a config.TIMEFRAMES key) loads the CSV resampled to that
+    bar size; each timeframe is stored and reused separately.
+    """
+    meta, index, columns = open_store(csv_path, cache_dir, timeframe)
+
+    lo, hi = 0, len(index)
+    if start_date is not None:
+        lo = np.searchsorted(index, np.datetime64(pd.to_datetime(start_date), 'ns'), side='left')
+    if end_date is not None:
+        hi = np.searchsorted(index, np.datetime64(pd.to_datetime(end_date), 'ns'), side='right')
+    hi = max(lo, hi)
+
+    return pd.DataFrame(
+        {name: values[lo:hi].view(np.ndarray) for name, values in columns.items()},
+        index=pd.DatetimeIndex(index[lo:hi].view(np.ndarray), name=meta['index_name'], copy=False),
+        copy=False
+    )
@@ -0,0 +1,180 @@
+# profiling.py
+"""
+Stage timing: wall time, rows processed and (optionally) allocated
+memory for each span of a run.
+
+    with record() as spans:
+        df = load_data(...)              # functions decorated with @timed
+        with span('plot', rows=len(df)):
+            ...
+    export_jsonl(spans, 'timings.jsonl')
+
+Nothing is recorded outside record(): span() and @timed then cost one
+thread-local lookup. Recording is per thread, so concurrent app
+sessions don't mix their spans.
+"""
+import contextlib
+import cProfile
+import io
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+from functools import wraps
+
+
+class _Local(threading.local):
+    recorder = None  # (spans, open span stack, memory) while record() is active
+
+
+_local = _Local()
+
+
+class _NullSpan:
+    """Stands in for a span when nothing is recording"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **fields):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    def __init__(self, spans, stack, memory, name, fields):
+        self.spans, self.stack, self.memory = spans, stack, memory
+        self.record = {'name': name, 'rows': None, **fields}
+
+    def set(self, **fields):
+        """Add fields (e.g. rows=len(df)) once they are known"""
+        self.record.update(fields)
+
+    def __enter__(self):
+        self.record['parent'] = self.stack[-1].record['name'] if self.stack else None
+        self.record['depth'] = len(self.stack)
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self.stack:
+                self.stack[-1].peak = max(self.stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+            self.start_memory, self.peak = current, current
+        self.stack.append(self)
+        self.record['start'] = time.time()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.record['seconds'] = time.perf_counter() - self.started
+        self.stack.pop()
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(self.peak, peak)
+            self.record['alloc_mb'] = (current - self.start_memory) / 1e6
+            self.record['peak_mb'] = (peak - self.start_memory) / 1e6
+            if self.stack:
+                self.stack[-1].peak = max(self.stack[-1].peak, peak)
+        self.spans.append(self.record)
+        return False
+
+
+@contextlib.contextmanager
+def record(memory=False):
+    """
+    Collect the spans opened in this thread until exit; yields the list
+    (spans are appended as they close, inner before outer).
+    memory=True also records allocations with tracemalloc, which slows
+    the run down and counts every thread's allocations.
+    """
+    previous = _local.recorder
+    spans = []
+    started_tracing = memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    _local.recorder = (spans, [], memory)
+    try:
+        yield spans
+    finally:
+        _local.recorder = previous
+        if started_tracing:
+            tracemalloc.stop()
+
+
+def span(name, **fields):
+    """Context manager timing a block; fields (rows=..., pair=...) go into the record"""
+    recorder = _local.recorder
+    if recorder is None:
+        return _NULL_SPAN
+    return _Span(*recorder, name, fields)
+
+
+def _rows(value):
+    shape = getattr(value, 'shape', None)
+    return int(shape[0]) if shape else None
+
+
+def timed(name, rows_from='result'):
+    """
+    Decorator recording each call as a span. rows is the length of the
+    result (rows_from='result') or of the first argument ('arg').
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            recorder = _local.recorder
+            if recorder is None:
+                return fn(*args, **kwargs)
+            with _Span(*recorder, name, {}) as s:
+                result = fn(*args, **kwargs)
+                s.set(rows=_rows(result if rows_from == 'result' else args[0] if args else None))
+            return result
+        return wrapper
+    return decorator
+
+
+def summarize(spans):
+    """Spans as a DataFrame in start order"""
+    import pandas as pd
+
+    columns = ['name', 'parent', 'depth', 'seconds', 'rows', 'alloc_mb', 'peak_mb']
+    frame = pd.DataFrame(spans)
+    if frame.empty:
+        return pd.DataFrame(columns=columns)
+    frame = frame.sort_values('start', kind='stable').reset_index(drop=True)
+    return frame[[c for c in columns if c in frame.columns]
+                 + [c for c in frame.columns if c not in columns and c != 'start']]
+
+
+def export_jsonl(spans, path, **fields):
+    """Append the spans to a JSON-lines file, one span per line plus fields (e.g. run=...)"""
+    with open(path, 'a') as f:
+        for row in spans:
+            f.write(json.dumps({**fields, **row}, default=str) + '\n')
+
+
+@contextlib.contextmanager
+def profile_run(path=None):
+    """
+    cProfile the block; yields the profiler (see profile_report) and
+    writes the stats to path (for pstats / snakeviz) if given
+    """
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        if path:
+            profiler.dump_stats(path)
+
+
+def profile_report(profiler, limit=25, sort='cumulative'):
+    """The top functions of a profile as text"""
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats(sort).print_stats(limit)
+    return out.getvalue()
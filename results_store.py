@@ -0,0 +1,214 @@
+# results_store.py
+"""
+Persistent index of finished backtests (SQLite), so a repeated
+(data, strategy, params, split) run is answered from a lookup.
+
+Rows are keyed by a content hash of the price data, so a changed CSV or
+Yahoo download gets a new key; storing a result for a dataset removes
+the rows of its older versions. Metrics are columns (train_sharpe,
+test_total_return, ...) for top-N queries and equity curves are stored
+compressed.
+
+    python results_store.py --pair GBPUSD=X --strategy "RSI Strategy" --by test_sharpe -n 20
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import RESULTS_DB_PATH
+from engine import run_backtest
+from metrics import PERIODS_PER_YEAR
+from strategies import STRATEGIES, default_params
+from sweep import METRIC_KEYS
+
+METRIC_COLUMNS = [f'{period}_{key}' for period in ('train', 'test') for key in METRIC_KEYS]
+
+
+def data_hash(df):
+    """Content hash of a price frame (dates and Adj Close)"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(df.index.as_unit('ns').asi8).tobytes())
+    digest.update(np.ascontiguousarray(df['Adj Close'].to_numpy(dtype=float)).tobytes())
+    return digest.hexdigest()
+
+
+def params_key(strategy, params):
+    """
+    Params with the strategy defaults filled in, as canonical JSON. Each
+    value is cast to its registered type (float when the param's default
+    or step is a float), so {'boll_std': 2} and {'boll_std': 2.0} match;
+    a fractional value for an int param is kept as it is.
+    """
+    values = {**default_params(strategy), **params}
+    for name, spec in STRATEGIES[strategy]['params'].items():
+        value = float(values[name])
+        if isinstance(spec['default'], float) or isinstance(spec.get('step'), float):
+            values[name] = value
+        elif value.is_integer():
+            values[name] = int(value)
+    return json.dumps(values, sort_keys=True, default=float)
+
+
+def encode_curve(series):
+    """A dated curve as compressed bytes: date steps as int64, values as float32"""
+    dates = series.index.as_unit('ns').asi8
+    out = io.BytesIO()
+    np.savez_compressed(out, start=dates[:1], steps=np.diff(dates),
+                        values=series.to_numpy(dtype=np.float32))
+    return out.getvalue()
+
+
+def decode_curve(blob):
+    with np.load(io.BytesIO(blob)) as arrays:
+        dates = np.cumsum(np.concatenate([arrays['start'], arrays['steps']]))
+        return pd.Series(arrays['values'].astype(float), index=pd.DatetimeIndex(dates.astype('datetime64[ns]')))
+
+
+class ResultsStore:
+    """
+    Backtest results keyed by (data hash, strategy, params, split_ratio,
+    periods_per_year). Safe to share between threads; each call opens its
+    own connection.
+    """
+
+    def __init__(self, path=RESULTS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._ready = False
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        if not self._ready:
+            with self._lock:
+                self._create(conn)
+                self._ready = True
+        return contextlib.closing(conn)
+
+    def _create(self, conn):
+        metric_columns = ''.join(f', {col} REAL' for col in METRIC_COLUMNS)
+        with conn:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS results (
+                    data_hash TEXT, strategy TEXT, params TEXT, split_ratio REAL, periods_per_year REAL,
+                    dataset TEXT, pair TEXT, created REAL, market_return REAL{metric_columns},
+                    metrics TEXT, equity BLOB,
+                    PRIMARY KEY (data_hash, strategy, params, split_ratio, periods_per_year))""")
+            conn.execute("CREATE INDEX IF NOT EXISTS results_pair ON results (pair, strategy)")
+            conn.execute("CREATE INDEX IF NOT EXISTS results_dataset ON results (dataset)")
+
+    def get(self, data_key, strategy, params, split_ratio=70, periods_per_year=PERIODS_PER_YEAR,
+            with_equity=True):
+        """{'train', 'test', 'market_return'[, 'equity']} or None if not stored"""
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT metrics{', equity' if with_equity else ''} FROM results WHERE data_hash = ? "
+                "AND strategy = ? AND params = ? AND split_ratio = ? AND periods_per_year = ?",
+                (data_key, strategy, params_key(strategy, params), split_ratio, periods_per_year)).fetchone()
+        if row is None:
+            return None
+        result = json.loads(row[0])
+        if with_equity:
+            result['equity'] = decode_curve(row[1]) if row[1] is not None else None
+        return result
+
+    def put(self, data_key, strategy, params, metrics, equity=None, split_ratio=70,
+            periods_per_year=PERIODS_PER_YEAR, dataset=None, pair=None):
+        """
+        Store a run's metrics ({'train', 'test', 'market_return'}) and equity
+        curve. dataset names where the data came from (e.g. source, pair,
+        dates, timeframe); rows of the same dataset with another data hash
+        are stale and removed.
+        """
+        values = {f'{period}_{key}': metrics[period].get(key)
+                  for period in ('train', 'test') for key in METRIC_KEYS}
+        row = {
+            'data_hash': data_key, 'strategy': strategy, 'params': params_key(strategy, params),
+            'split_ratio': split_ratio, 'periods_per_year': periods_per_year,
+            'dataset': dataset, 'pair': pair, 'created': time.time(),
+            'market_return': metrics['market_return'], **values,
+            'metrics': json.dumps({k: metrics[k] for k in ('train', 'test', 'market_return')}, default=float),
+            'equity': encode_curve(equity) if equity is not None else None
+        }
+        with self._connect() as conn, conn:
+            if dataset is not None:
+                conn.execute("DELETE FROM results WHERE dataset = ? AND data_hash != ?", (dataset, data_key))
+            conn.execute(f"INSERT OR REPLACE INTO results ({', '.join(row)}) VALUES ({', '.join('?' * len(row))})",
+                         list(row.values()))
+
+    def top(self, pair=None, strategy=None, by='test_sharpe', n=20, ascending=False, dataset=None):
+        """The n best stored runs by a metric column, optionally for one pair / strategy / dataset"""
+        if by not in METRIC_COLUMNS + ['market_return']:
+            raise ValueError(f"Unknown metric column: {by}")
+        filters = {'pair': pair, 'strategy': strategy, 'dataset': dataset}
+        where = [f"{col} = ?" for col, value in filters.items() if value is not None]
+        query = (f"SELECT pair, strategy, params, split_ratio, dataset, market_return, "
+                 f"{', '.join(METRIC_COLUMNS)} FROM results"
+                 + (f" WHERE {' AND '.join(where)}" if where else "")
+                 + f" ORDER BY {by} IS NULL, {by} {'ASC' if ascending else 'DESC'} LIMIT ?")
+        with self._connect() as conn:
+            table = pd.read_sql_query(query, conn, params=[v for v in filters.values() if v is not None] + [n])
+        params = pd.DataFrame([json.loads(p) for p in table.pop('params')], index=table.index)
+        return pd.concat([table.iloc[:, :2], params, table.iloc[:, 2:]], axis=1)
+
+    def clear(self):
+        with self._connect() as conn, conn:
+            conn.execute("DELETE FROM results")
+
+
+# Shared by everything in this process
+default_store = ResultsStore()
+
+
+def run_backtest_stored(df, strategy, store, dataset=None, pair=None, split_ratio=70,
+                        periods_per_year=PERIODS_PER_YEAR, refresh=False, cache=None, compact=False,
+                        **params):
+    """
+    engine.run_backtest's metrics (plus 'equity', the strategy's growth of
+    1 unit), looked up in the store first and stored after a fresh run.
+    refresh=True always reruns.
+    """
+    key = data_hash(df)
+    if not refresh:
+        stored = store.get(key, strategy, params, split_ratio, periods_per_year)
+        if stored is not None:
+            return stored
+
+    out, metrics = run_backtest(df, strategy, split_ratio=split_ratio, cache=cache,
+                                periods_per_year=periods_per_year, compact=compact, **params)
+    metrics['equity'] = out['Cumulative_Strategy']
+    store.put(key, strategy, params, metrics, metrics['equity'], split_ratio, periods_per_year,
+              dataset=dataset, pair=pair)
+    return metrics
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query stored backtest results")
+    parser.add_argument('--db', default=RESULTS_DB_PATH)
+    parser.add_argument('--pair')
+    parser.add_argument('--strategy')
+    parser.add_argument('--by', default='test_sharpe', help="metric column to rank by")
+    parser.add_argument('-n', type=int, default=20)
+    parser.add_argument('--ascending', action='store_true')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No results database at {args.db}", file=sys.stderr)
+        return 1
+    table = ResultsStore(args.db).top(args.pair, args.strategy, args.by, args.n, args.ascending)
+    table.to_csv(sys.stdout, index=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+# robustness.py
+"""
+Monte Carlo robustness checks for a backtest: resample the strategy
+returns of the app pipeline (engine.prepare_backtest) thousands of times
+and look at the spread of total return, Sharpe and max drawdown.
+
+    df = prepare_backtest(df, "RSI Strategy")
+    report = robustness(df, n_samples=10_000, method='bootstrap')
+
+Resamples are generated as index matrices (one row per resample, so the
+cumulative products run along contiguous memory) and scored as one 2-D
+batch, chunk_size resamples at a time.
+"""
+import numpy as np
+import pandas as pd
+from metrics import PERIODS_PER_YEAR, calculate_market_return, calculate_returns_metrics
+
+ROBUSTNESS_METRICS = ['total_return', 'sharpe', 'max_drawdown']
+
+
+def default_block_size(n_rows):
+    """Cube-root rule for the bootstrap block length"""
+    return max(1, int(round(n_rows ** (1 / 3))))
+
+
+def block_bootstrap_indices(n_rows, n_samples, block_size, rng):
+    """
+    Circular block bootstrap: each resample glues random blocks of
+    block_size consecutive rows (wrapping at the end) into n_rows rows.
+    Returns an (n_samples, n_rows) row index matrix.
+    """
+    n_blocks = -(-n_rows // block_size)
+    starts = rng.integers(0, n_rows, size=(n_samples, n_blocks))
+    offsets = np.arange(n_rows) % block_size
+    return (np.repeat(starts, block_size, axis=1)[:, :n_rows] + offsets) % n_rows
+
+
+def trade_segments(positions):
+    """(start, length) of each run of constant position (trades and flat stretches)"""
+    positions = np.asarray(positions)
+    starts = np.flatnonzero(np.r_[True, positions[1:] != positions[:-1]])
+    return starts, np.diff(np.r_[starts, len(positions)])
+
+
+def trade_shuffle_indices(starts, lengths, n_samples, rng):
+    """
+    Shuffle the order of the segments, keeping the rows inside each one.
+    Returns an (n_samples, n_rows) row index matrix.
+    """
+    n_rows = int(lengths.sum())
+    order = np.argsort(rng.random((n_samples, len(starts))), axis=1)
+    seg_starts, seg_lengths = starts[order].ravel(), lengths[order].ravel()
+    seg_offsets = (np.cumsum(lengths[order], axis=1) - lengths[order]).ravel()
+    within = np.tile(np.arange(n_rows), n_samples) - np.repeat(seg_offsets, seg_lengths)
+    return (np.repeat(seg_starts, seg_lengths) + within).reshape(n_samples, n_rows)
+
+
+def score_resamples(returns, periods_per_year=PERIODS_PER_YEAR):
+    """
+    ROBUSTNESS_METRICS for a (n_samples, n_rows) returns matrix, with the
+    same definitions as metrics.calculate_returns_metrics
+    """
+    equity = np.cumprod(1 + returns, axis=1)
+    peak = np.maximum(np.maximum.accumulate(equity, axis=1), 1.0)
+    std = returns.std(axis=1, ddof=1) if returns.shape[1] > 1 else np.zeros(len(returns))
+    mean = returns.mean(axis=1)
+    return {
+        'total_return': (equity[:, -1] - 1) * 100,
+        'sharpe': np.divide(np.sqrt(periods_per_year) * mean, std, out=np.zeros_like(mean), where=std > 0),
+        'max_drawdown': (equity / peak - 1).min(axis=1) * 100
+    }
+
+
+def resample_metrics(returns, positions=None, n_samples=10_000, method='bootstrap', block_size=None,
+                     seed=0, chunk_size=1000, periods_per_year=PERIODS_PER_YEAR):
+    """
+    ROBUSTNESS_METRICS for n_samples resamples of a returns array, as a
+    DataFrame with one row per resample.
+
+    method='bootstrap' draws circular blocks of block_size bars (default:
+    cube root of the length); method='shuffle' reorders whole trades
+    (runs of constant position), which keeps total return and Sharpe and
+    shows how much of the drawdown is down to the order of the trades.
+    chunk_size bounds memory to chunk_size resamples at a time; the random
+    draws come from one generator in resample order, so the results for
+    a seed don't depend on it.
+    """
+    returns = np.asarray(returns, dtype=float)
+    n_rows = len(returns)
+    rng = np.random.default_rng(seed)
+    chunk_size = chunk_size or n_samples
+
+    if method == 'bootstrap':
+        block_size = block_size or default_block_size(n_rows)
+        draw = lambda m: block_bootstrap_indices(n_rows, m, block_size, rng)
+    elif method == 'shuffle':
+        if positions is None:
+            raise ValueError("Trade shuffle needs the positions")
+        starts, lengths = trade_segments(positions)
+        draw = lambda m: trade_shuffle_indices(starts, lengths, m, rng)
+    else:
+        raise ValueError(f"Unknown resampling method: {method}")
+
+    results = {key: [] for key in ROBUSTNESS_METRICS}
+    for start in range(0, n_samples, chunk_size):
+        rows = draw(min(chunk_size, n_samples - start))
+        chunk_metrics = score_resamples(returns[rows], periods_per_year)
+        for key in ROBUSTNESS_METRICS:
+            results[key].append(chunk_metrics[key])
+    return pd.DataFrame({key: np.concatenate(parts) for key, parts in results.items()})
+
+
+def robustness(df, n_samples=10_000, method='bootstrap', block_size=None, confidence=95, seed=0,
+               chunk_size=1000, periods_per_year=PERIODS_PER_YEAR):
+    """
+    Robustness report for a backtest frame (Strategy_Returns, Position and
+    Cumulative_Market columns, as returned by engine.prepare_backtest):
+
+    'intervals': lower / median / upper (confidence %) and observed value
+        of each metric
+    'p_beat_market': share of resamples whose total return beats
+        buy-and-hold (metrics.calculate_market_return)
+    'samples': the per-resample metrics
+    """
+    returns = df['Strategy_Returns'].to_numpy(dtype=float)
+    positions = df['Position'].to_numpy() if 'Position' in df.columns else None
+    samples = resample_metrics(returns, positions, n_samples, method, block_size, seed, chunk_size,
+                               periods_per_year)
+
+    observed = calculate_returns_metrics(returns, periods_per_year=periods_per_year)
+    tail = (100 - confidence) / 2
+    bounds = np.nanpercentile(samples.to_numpy(), [tail, 50, 100 - tail], axis=0)
+    intervals = pd.DataFrame(bounds.T, index=ROBUSTNESS_METRICS, columns=['lower', 'median', 'upper'])
+    intervals['observed'] = [observed[key] for key in ROBUSTNESS_METRICS]
+
+    market_return = calculate_market_return(df)
+    return {
+        'intervals': intervals,
+        'market_return': market_return,
+        'p_beat_market': float((samples['total_return'] > market_return).mean()),
+        'samples': samples
+    }
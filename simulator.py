@@ -0,0 +1,144 @@
+# simulator.py
+import numpy as np
+import pandas as pd
+from config import DEFAULT_COSTS, INITIAL_CAPITAL, PAIR_COSTS
+from metrics import accumulate
+
+
+def pip_size(pair):
+    """Price of one pip: 0.01 for JPY quoted pairs, 0.0001 otherwise"""
+    return 0.01 if pair and pair.upper().replace('=X', '').endswith('JPY') else 0.0001
+
+
+def trade_cost(pair=None, spread_pips=None, commission_pips=None):
+    """
+    Cost of changing the position by one unit, in price units: half the
+    spread plus one commission. Missing values come from PAIR_COSTS.
+    """
+    costs = PAIR_COSTS.get(pair, DEFAULT_COSTS)
+    spread = costs['spread'] if spread_pips is None else spread_pips
+    commission = costs['commission'] if commission_pips is None else commission_pips
+    return (spread / 2 + commission) * pip_size(pair)
+
+
+def hold_signals(signals):
+    """
+    Carry each non-zero signal forward until the next one, so a position
+    is held between signals instead of going flat. 1-D or 2-D (columns).
+    """
+    signals = np.asarray(signals)
+    one_run = signals.ndim == 1
+    if one_run:
+        signals = signals[:, None]
+    rows = np.arange(len(signals))[:, None]
+    last = accumulate(np.maximum, np.where(signals != 0, rows, -1)) if len(signals) else rows
+    held = np.take_along_axis(signals, np.maximum(last, 0), axis=0)
+    held[last < 0] = 0
+    return held[:, 0] if one_run else held
+
+
+def lag_positions(signals):
+    """Position held on each bar: the previous bar's signal (flat on the first bar)"""
+    signals = np.asarray(signals)
+    positions = np.zeros(signals.shape, dtype=signals.dtype)
+    positions[1:] = signals[:-1]
+    return positions
+
+
+def position_returns(price, positions, cost=0.0):
+    """
+    Net returns of holding ``positions`` (1-D or one column per run),
+    continuously rebalanced to 1x equity. Each unit of position change
+    pays ``cost`` (price units) at the previous close.
+    """
+    price = np.asarray(price, dtype=float)
+    if positions.ndim == 2:
+        price = price[:, None]
+    returns = np.full(positions.shape, np.nan)
+    returns[1:] = positions[1:] * (price[1:] / price[:-1] - 1)
+    if cost:
+        change = np.abs(np.diff(positions[1:], axis=0, prepend=positions[:1]).astype(float))
+        returns[1:] -= change * cost / price[:-1]
+    return returns
+
+
+def simulate(df, pair=None, spread_pips=None, commission_pips=None, capital=INITIAL_CAPITAL,
+             sizing='fraction', size=1.0, hold=True):
+    """
+    Trade a frame's Signal column with costs and position sizing.
+
+    The position is the previous bar's signal (carried forward between
+    signals when hold=True), filled at the previous close. Every entry and
+    exit pays half the spread plus the commission. sizing='fraction' opens
+    each trade with size x current equity, sizing='units' with a fixed
+    ``size`` units. P&L is in the quote currency.
+
+    Returns (df, trades): df gains Position, Units, Costs, Portfolio_Value
+    and Strategy_Returns columns; trades has one row per round trip.
+    """
+    df = df.copy()
+    price = df['Adj Close'].to_numpy(dtype=float)
+    signals = df['Signal'].to_numpy()
+    n_rows = len(price)
+    cost = trade_cost(pair, spread_pips, commission_pips)
+
+    positions = lag_positions(hold_signals(signals) if hold else signals).astype(np.int8)
+
+    # Trades are runs of the same non-zero position
+    prev = lag_positions(positions)
+    changes = np.flatnonzero(positions != prev)
+    next_change = np.append(changes[1:], n_rows)
+    is_entry = positions[changes] != 0
+    starts, ends = changes[is_entry], next_change[is_entry] - 1
+    closed = ends < n_rows - 1
+    direction = positions[starts].astype(float)
+    entry_price = price[starts - 1]
+    exit_price = price[ends]
+
+    # Equity before each trade; trade k's result only depends on equity at its entry
+    move = direction * (exit_price - entry_price) - cost * (1 + closed)
+    if sizing == 'fraction':
+        growth = 1 + size * move / entry_price
+        equity = capital * np.concatenate(([1.0], np.cumprod(growth)))
+        units = size * equity[:-1] / entry_price
+    elif sizing == 'units':
+        units = np.full(len(starts), float(size))
+        equity = capital + np.concatenate(([0.0], np.cumsum(units * move)))
+    else:
+        raise ValueError(f"Unknown sizing: {sizing}")
+    pnl = units * move
+
+    # Per bar: mark open trades to market, flat bars carry the last closed equity
+    bars = np.arange(n_rows)
+    trade = np.searchsorted(starts, bars, side='right') - 1
+    in_trade = (trade >= 0) & (bars <= ends[np.maximum(trade, 0)]) if len(starts) else np.zeros(n_rows, bool)
+    k = trade[in_trade]
+    bar_units = np.zeros(n_rows)
+    bar_units[in_trade] = units[k] * direction[k]
+    bar_costs = np.zeros(n_rows)
+    bar_costs[starts] += units * cost
+    bar_costs[ends[closed]] += units[closed] * cost
+    value = equity[np.searchsorted(ends, bars, side='left')]
+    value[in_trade] = (equity[k] + units[k] * direction[k] * (price[in_trade] - entry_price[k])
+                       - units[k] * cost - np.where(bars[in_trade] == ends[k], closed[k] * units[k] * cost, 0.0))
+
+    df['Position'] = positions
+    df['Units'] = bar_units
+    df['Costs'] = bar_costs
+    df['Portfolio_Value'] = value
+    df['Strategy_Returns'] = value / np.concatenate(([capital], value[:-1])) - 1
+
+    trades = pd.DataFrame({
+        'entry_time': df.index[starts - 1],
+        'exit_time': df.index[ends],
+        'direction': direction.astype(np.int8),
+        'entry_price': entry_price,
+        'exit_price': exit_price,
+        'units': units,
+        'pnl': pnl,
+        'return': pnl / equity[:-1] * 100,
+        'costs': units * cost * (1 + closed),
+        'bars': ends - starts + 1,
+        'open': ~closed
+    })
+    return df, trades
@@ -1,32 +1,148 @@
 # strategies.py
+import numpy as np
 import pandas as pd
+from indicators import column_names, compute_indicators
+from profiling import timed
 
+# Strategy name -> {'params', 'indicators', 'rule', 'overlay', 'panel', 'levels', 'lookback'}
+STRATEGIES = {}
+
+
+def register_strategy(name, params, indicators, overlay=(), panel=(), levels=(), lookback=2):
+    """
+    Decorator adding a signal rule to the strategy registry.
+
+    params: {param: {'label', 'min', 'max', 'default'[, 'step'][, 'indicator']}}
+        (sidebar sliders; 'indicator': True marks params the indicators depend on)
+    indicators: fn(params) -> {local name: (indicator name, args)} needed by the rule
+    overlay / panel: indicator columns drawn on the price chart / below it
+    levels: params drawn as horizontal lines on the panel
+    lookback: bars the rule's value on a bar depends on (that bar
+        included), so streaming callers only keep that many
+
+    The rule gets (price, indicators, params) with NumPy arrays, where
+    indicators is {local name: {column: array}}, and returns (buy, sell)
+    boolean masks. Sell overrides buy. Arrays may be 2-D with one column
+    per series, and in sweeps each param is then an array with one value
+    per column, so rules should only use params elementwise.
+    """
+    def decorator(rule):
+        STRATEGIES[name] = {'params': params, 'indicators': indicators, 'rule': rule,
+                            'overlay': list(overlay), 'panel': list(panel), 'levels': list(levels),
+                            'lookback': lookback}
+        return rule
+    return decorator
+
+
+def strategy_names():
+    return list(STRATEGIES)
+
+
+def default_params(strategy):
+    return {name: spec['default'] for name, spec in STRATEGIES[strategy]['params'].items()}
+
+
+def indicator_param_names(strategy):
+    """Params that change the strategy's indicator columns; the rest only change the signals"""
+    return [name for name, spec in STRATEGIES[strategy]['params'].items() if spec.get('indicator')]
+
+
+def resolve_params(strategy, params):
+    """
+    The strategy's full params: its registered defaults updated with
+    params. Raises ValueError for an unknown strategy.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    return {**default_params(strategy), **params}
+
+
+def required_indicators(strategy, **kwargs):
+    """{local name: (indicator name, args)} the strategy needs with these params"""
+    return STRATEGIES[strategy]['indicators'](resolve_params(strategy, kwargs))
+
+
+def indicator_columns(strategy, **kwargs):
+    """Frame columns add_indicators adds for the strategy with these params"""
+    names = column_names(required_indicators(strategy, **kwargs).values())
+    return [frame_col for columns in names.values() for frame_col in columns.values()]
+
+
+def strategy_signals(strategy, price, indicators, **kwargs):
+    """int8 signals (1 buy, -1 sell, 0 none) from planned indicators (see compute_indicators)"""
+    params = resolve_params(strategy, kwargs)
+    needed = STRATEGIES[strategy]['indicators'](params)
+    local = {name: indicators[(indicator, tuple(args))] for name, (indicator, args) in needed.items()}
+    buy, sell = STRATEGIES[strategy]['rule'](price, local, params)
+    return np.where(sell, -1, np.where(buy, 1, 0)).astype(np.int8)
+
+
+def compute_signals(price, strategy, cache=None, **kwargs):
+    """Indicators and signals straight from a price array (1-D or one column per series)"""
+    price = np.asarray(price, dtype=float)
+    indicators = compute_indicators(price, required_indicators(strategy, **kwargs).values(), cache)
+    return strategy_signals(strategy, price, indicators, **kwargs)
+
+
+@timed('generate_signal')
 def generate_signal(df, strategy, **kwargs):
     """
     Generate trading signals based on the selected strategy
+    (from the indicator columns already added by add_indicators)
     """
-    sig = pd.Series(0, index=df.index)
-    
-    if strategy == "RSI Strategy":
-        # Get parameters with defaults
-        rsi_oversold = kwargs.get('rsi_oversold', 30)
-        rsi_overbought = kwargs.get('rsi_overbought', 70)
-        
-        # Buy when oversold, sell when overbought
-        sig[df["RSI"] < rsi_oversold] = 1
-        sig[df["RSI"] > rsi_overbought] = -1
-    
-    elif strategy == "MACD Strategy":
-        # MACD crossover signals
-        macd_cross_above = (df["MACD"] > df["MACD_signal"]) & (df["MACD"].shift(1) <= df["MACD_signal"].shift(1))
-        macd_cross_below = (df["MACD"] < df["MACD_signal"]) & (df["MACD"].shift(1) >= df["MACD_signal"].shift(1))
-        
-        sig[macd_cross_above] = 1
-        sig[macd_cross_below] = -1
-    
-    elif strategy == "Bollinger Strategy":
-        # Bollinger Band signals
-        sig[df["Adj Close"] <= df["BB_lower"]] = 1
-        sig[df["Adj Close"] >= df["BB_upper"]] = -1
-    
-    return sig
+    price = df["Adj Close"].to_numpy(dtype=float)
+    names = column_names(required_indicators(strategy, **kwargs).values())
+    indicators = {key: {col: df[frame_col].to_numpy() for col, frame_col in columns.items()}
+                  for key, columns in names.items()}
+    return pd.Series(strategy_signals(strategy, price, indicators, **kwargs), index=df.index)
+
+
+# ==============================
+# Strategies
+# ==============================
+@register_strategy(
+    "RSI Strategy",
+    params={
+        'rsi_period': {'label': "RSI Period", 'min': 5, 'max': 30, 'default': 14, 'indicator': True},
+        'rsi_oversold': {'label': "Oversold Threshold", 'min': 10, 'max': 40, 'default': 30},
+        'rsi_overbought': {'label': "Overbought Threshold", 'min': 60, 'max': 90, 'default': 70}
+    },
+    indicators=lambda p: {'rsi': ('rsi', (p['rsi_period'],))},
+    panel=['RSI'], levels=['rsi_overbought', 'rsi_oversold'])
+def rsi_rule(price, ind, p):
+    # Buy when oversold, sell when overbought
+    rsi = ind['rsi']['RSI']
+    return rsi < p['rsi_oversold'], rsi > p['rsi_overbought']
+
+
+@register_strategy(
+    "MACD Strategy",
+    params={
+        'macd_fast': {'label': "MACD Fast", 'min': 5, 'max': 20, 'default': 12, 'indicator': True},
+        'macd_slow': {'label': "MACD Slow", 'min': 20, 'max': 40, 'default': 26, 'indicator': True},
+        'macd_signal': {'label': "MACD Signal", 'min': 5, 'max': 20, 'default': 9, 'indicator': True}
+    },
+    indicators=lambda p: {'macd': ('macd', (p['macd_fast'], p['macd_slow'], p['macd_signal']))},
+    panel=['MACD', 'MACD_signal'])
+def macd_rule(price, ind, p):
+    # MACD crossover signals (previous bar compared once, by slicing)
+    line, signal = ind['macd']['MACD'], ind['macd']['MACD_signal']
+    buy = np.zeros(line.shape, dtype=bool)
+    sell = np.zeros(line.shape, dtype=bool)
+    buy[1:] = (line[1:] > signal[1:]) & (line[:-1] <= signal[:-1])
+    sell[1:] = (line[1:] < signal[1:]) & (line[:-1] >= signal[:-1])
+    return buy, sell
+
+
+@register_strategy(
+    "Bollinger Strategy",
+    params={
+        'boll_period': {'label': "Bollinger Period", 'min': 10, 'max': 50, 'default': 20, 'indicator': True},
+        'boll_std': {'label': "Standard Deviations", 'min': 1.0, 'max': 3.0, 'default': 2.0, 'step': 0.5,
+                     'indicator': True}
+    },
+    indicators=lambda p: {'bands': ('bollinger', (p['boll_period'], p['boll_std']))},
+    overlay=['BB_upper', 'BB_lower', 'BB_middle'])
+def bollinger_rule(price, ind, p):
+    # Buy at the lower band, sell at the upper band
+    return price <= ind['bands']['BB_lower'], price >= ind['bands']['BB_upper']
@@ -0,0 +1,181 @@
+# streaming.py
+import math
+from indicators import column_names
+from strategies import required_indicators
+
+
+def bar_price(bar):
+    """Price of a bar: either a price or a mapping/row with 'Adj Close'"""
+    if isinstance(bar, (int, float)):
+        return float(bar)
+    return float(bar['Adj Close'])
+
+
+class RollingWindow:
+    """
+    Fixed-size ring buffer with a running mean and sum of squared deviations
+    (Welford updates). The totals are re-summed once per lap so rounding
+    drift can't build up; that keeps each push O(1) amortized. While the
+    window holds one repeated value the mean is that value and the
+    variance exactly 0 (as in kernels.rolling_mean_var).
+    """
+    __slots__ = ('size', 'values', 'pos', 'count', 'mean', 'm2', 'run')
+
+    def __init__(self, size):
+        self.size = size
+        self.values = [0.0] * size
+        self.pos = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.run = 0  # trailing pushes of the same value
+
+    @property
+    def full(self):
+        return self.count == self.size
+
+    def push(self, x):
+        self.run = self.run + 1 if self.count and x == self.values[self.pos - 1] else 1
+        if self.count < self.size:
+            self.count += 1
+            delta = x - self.mean
+            self.mean += delta / self.count
+            self.m2 += delta * (x - self.mean)
+        else:
+            old = self.values[self.pos]
+            new_mean = self.mean + (x - old) / self.size
+            self.m2 += (x - old) * (x - new_mean + old - self.mean)
+            self.mean = new_mean
+
+        self.values[self.pos] = x
+        self.pos = (self.pos + 1) % self.size
+        if self.run >= self.count:
+            self.mean, self.m2 = x, 0.0
+        elif self.pos == 0 and self.full:
+            self._resync()
+
+    def _resync(self):
+        self.mean = math.fsum(self.values) / self.size
+        self.m2 = math.fsum((v - self.mean) ** 2 for v in self.values)
+
+    def variance(self):
+        if self.count < 2:
+            return math.nan
+        return max(self.m2, 0.0) / (self.count - 1)
+
+
+class StreamingRSI:
+    """RSI updated one bar at a time, same definition as indicators.rsi"""
+
+    def __init__(self, period=14):
+        self.period = period
+        self.gains = RollingWindow(self.period)
+        self.losses = RollingWindow(self.period)
+        self.prev_price = None
+        self.rsi = math.nan
+
+    def update(self, bar):
+        price = bar_price(bar)
+        if self.prev_price is not None:
+            delta = price - self.prev_price
+            self.gains.push(max(delta, 0.0))
+            self.losses.push(max(-delta, 0.0))
+        self.prev_price = price
+
+        if self.gains.full:
+            avg_gain = self.gains.mean
+            avg_loss = self.losses.mean
+            if avg_loss > 0:
+                self.rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+            else:
+                self.rsi = 100.0 if avg_gain > 0 else math.nan
+        return self.snapshot()
+
+    def snapshot(self):
+        return {'RSI': self.rsi}
+
+
+class StreamingMACD:
+    """MACD and signal line from EMAs with adjust=False"""
+
+    def __init__(self, fast=12, slow=26, signal=9):
+        self.alpha_fast = 2.0 / (fast + 1)
+        self.alpha_slow = 2.0 / (slow + 1)
+        self.alpha_signal = 2.0 / (signal + 1)
+        self.ema_fast = None
+        self.ema_slow = None
+        self.macd = math.nan
+        self.macd_signal = math.nan
+
+    def update(self, bar):
+        price = bar_price(bar)
+        if self.ema_fast is None:
+            self.ema_fast = self.ema_slow = price
+            self.macd = 0.0
+            self.macd_signal = 0.0
+        else:
+            self.ema_fast += self.alpha_fast * (price - self.ema_fast)
+            self.ema_slow += self.alpha_slow * (price - self.ema_slow)
+            self.macd = self.ema_fast - self.ema_slow
+            self.macd_signal += self.alpha_signal * (self.macd - self.macd_signal)
+        return self.snapshot()
+
+    def snapshot(self):
+        return {'MACD': self.macd, 'MACD_signal': self.macd_signal}
+
+
+class StreamingBollinger:
+    """Bollinger Bands over a rolling window of prices"""
+
+    def __init__(self, period=20, num_std=2):
+        self.period = period
+        self.num_std = num_std
+        self.window = RollingWindow(self.period)
+        self.middle = self.upper = self.lower = math.nan
+
+    def update(self, bar):
+        self.window.push(bar_price(bar))
+        if self.window.full:
+            band = math.sqrt(self.window.variance()) * self.num_std
+            self.middle = self.window.mean
+            self.upper = self.middle + band
+            self.lower = self.middle - band
+        return self.snapshot()
+
+    def snapshot(self):
+        return {'BB_middle': self.middle, 'BB_upper': self.upper, 'BB_lower': self.lower}
+
+
+# Indicator name (indicators.INDICATORS) -> class taking the same args
+STREAMING_INDICATORS = {
+    'rsi': StreamingRSI,
+    'macd': StreamingMACD,
+    'bollinger': StreamingBollinger
+}
+
+
+class StreamingIndicators:
+    """
+    Every indicator a strategy needs (strategies.required_indicators),
+    updated together; update returns {frame column: value} with the
+    columns add_indicators would add.
+    """
+
+    def __init__(self, requests):
+        self.names = column_names(requests)
+        for name, _ in self.names:
+            if name not in STREAMING_INDICATORS:
+                raise ValueError(f"No streaming version of indicator: {name}")
+        self.indicators = {key: STREAMING_INDICATORS[key[0]](*key[1]) for key in self.names}
+
+    def update(self, bar):
+        values = {}
+        for key, indicator in self.indicators.items():
+            for col, value in indicator.update(bar).items():
+                values[self.names[key][col]] = value
+        return values
+
+
+def streaming_indicator(strategy, **kwargs):
+    """Streaming counterpart of add_indicators for one strategy"""
+    return StreamingIndicators(required_indicators(strategy, **kwargs).values())
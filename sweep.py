@@ -0,0 +1,164 @@
+# sweep.py
+import itertools
+import numpy as np
+import pandas as pd
+from indicator_cache import IndicatorCache
+from indicators import INDICATORS, compute_indicators
+from metrics import calculate_metrics_batch
+from simulator import hold_signals, lag_positions, position_returns
+from strategies import STRATEGIES, required_indicators, resolve_params
+
+METRIC_KEYS = ['total_return', 'annual_return', 'sharpe', 'sortino', 'max_drawdown',
+               'max_drawdown_duration', 'calmar', 'win_rate', 'profit_factor', 'exposure',
+               'round_trips', 'trades']
+
+
+def default_grid(strategy):
+    """Every value of each registered param's slider (min to max by step)"""
+    grid = {}
+    for name, spec in STRATEGIES[strategy]['params'].items():
+        step = spec.get('step', 1)
+        count = int(round((spec['max'] - spec['min']) / step)) + 1
+        values = [spec['min'] + i * step for i in range(count)]
+        grid[name] = [round(v, 10) for v in values] if isinstance(step, float) else values
+    return grid
+
+
+def _chunk_signals(strategy, price, combos, indicators):
+    """
+    Signal matrix for a chunk of parameter combinations from planned
+    indicators: the strategy's rule runs once, with one column (and one
+    value of each param) per combination.
+    Returns (signals, indicator_valid), both with one column per combination.
+    """
+    resolved = [resolve_params(strategy, combo) for combo in combos]
+    needed = [STRATEGIES[strategy]['indicators'](params) for params in resolved]
+    local = {}
+    for name, (indicator, _) in needed[0].items():
+        # Stack each distinct series once, then pick one column per combination
+        keys = [(n[name][0], tuple(n[name][1])) for n in needed]
+        distinct = list(dict.fromkeys(keys))
+        cols = [distinct.index(key) for key in keys] if len(distinct) < len(keys) else None
+        local[name] = {}
+        for col in INDICATORS[indicator]['columns']:
+            stacked = np.column_stack([indicators[key][col] for key in distinct])
+            local[name][col] = stacked[:, cols] if cols is not None else stacked
+    params = {name: np.array([p[name] for p in resolved]) for name in resolved[0]}
+    buy, sell = STRATEGIES[strategy]['rule'](price[:, None], local, params)
+
+    valid = np.ones((len(price), len(combos)), dtype=bool)
+    for columns in local.values():
+        for values in columns.values():
+            valid &= ~np.isnan(values)
+
+    # Sell overrides buy, as in strategies.generate_signal
+    shape = valid.shape
+    signals = np.where(np.broadcast_to(sell, shape), -1, np.where(np.broadcast_to(buy, shape), 1, 0))
+    return signals.astype(np.int8), valid
+
+
+def expand_grid(strategy, param_grid=None):
+    """
+    Return (param names, list of param dicts) for every combination in the
+    grid (default: default_grid)
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy: {strategy}")
+    grid = {k: list(v) for k, v in (param_grid or default_grid(strategy)).items()}
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+    return names, combos
+
+
+def price_returns(df):
+    """Adj Close as an array and its bar-to-bar returns (first row NaN, like pct_change)"""
+    price = df['Adj Close'].to_numpy(dtype=float)
+    returns = np.empty(len(price))
+    returns[:1] = np.nan
+    returns[1:] = price[1:] / price[:-1] - 1
+    return price, returns
+
+
+def sweep_signals(price, strategy, combos, chunk_size=1024, cache=None):
+    """
+    Yield (start, signals, valid) for consecutive chunks of combos.
+    Each chunk's distinct indicator requests are planned with
+    indicators.compute_indicators; their building blocks (EMAs, rolling
+    mean/variance, ...) go through an IndicatorCache (a fresh one unless
+    given), so each is computed once for all chunks.
+    """
+    cache = cache if cache is not None else IndicatorCache()
+    for start in range(0, len(combos), chunk_size):
+        chunk = combos[start:start + chunk_size]
+        requests = [request for combo in chunk
+                    for request in required_indicators(strategy, **combo).values()]
+        indicators = compute_indicators(price, requests, cache)
+        signals, valid = _chunk_signals(strategy, price, chunk, indicators)
+        yield start, signals, valid
+
+
+def score_signals(price, signals, valid, split_ratio=70, hold=False, cost=0.0):
+    """
+    train_/test_ metrics for a signal matrix (one column per strategy),
+    following the app.py pipeline: 1-bar signal lag, cumprod, then the
+    train/test split over the rows marked valid (the rows dropna keeps).
+    Returns {'train_total_return': array, ...} with one value per column.
+    """
+    # Strategy returns (follow signal with 1 day delay)
+    positions = lag_positions(hold_signals(signals) if hold else signals)
+    strategy_returns = position_returns(price, positions, cost)
+
+    # Cumulative returns (starting from 1)
+    cumulative = np.empty(signals.shape)
+    cumulative[0] = np.nan
+    cumulative[1:] = np.cumprod(1 + strategy_returns[1:], axis=0)
+
+    # Split into train/test, per column, over the rows that survive dropna
+    split_idx = np.floor(valid.sum(axis=0) * (split_ratio / 100))
+    train_mask = valid & (np.cumsum(valid, axis=0) <= split_idx)
+    test_mask = valid & ~train_mask
+
+    # Only score the rows each slice can touch
+    train_end = len(price) - np.argmax(train_mask[::-1].any(axis=1)) if train_mask.any() else 0
+    test_start = np.argmax(test_mask.any(axis=1)) if test_mask.any() else len(price)
+    slices = (('train', slice(0, train_end), train_mask), ('test', slice(test_start, None), test_mask))
+
+    results = {}
+    for prefix, rows, mask in slices:
+        chunk_metrics = calculate_metrics_batch(strategy_returns[rows], signals[rows],
+                                                cumulative[rows], mask[rows], positions[rows])
+        results.update({f'{prefix}_{key}': chunk_metrics[key] for key in METRIC_KEYS})
+    return results
+
+
+def run_sweep(df, strategy, param_grid=None, split_ratio=70,
+              rank_by='train_total_return', chunk_size=1024, hold=False, cost=0.0):
+    """
+    Backtest every parameter combination in param_grid in one batched pass.
+
+    Reproduces the app.py pipeline (add_indicators, generate_signal, 1-bar
+    signal lag, cumprod, dropna, train/test split, calculate_metrics) with
+    one NumPy column per combination, and returns a results table ranked
+    by ``rank_by`` (best first).
+
+    hold=True carries each signal forward until the next one; ``cost`` is
+    charged per unit of position change, in price units (see
+    simulator.trade_cost).
+    """
+    names, combos = expand_grid(strategy, param_grid)
+    price, returns = price_returns(df)
+
+    # Rows that dropna would drop no matter which parameters are used
+    base_valid = df.notna().all(axis=1).to_numpy() & ~np.isnan(returns)
+
+    results = {f'{prefix}_{key}': [] for prefix in ('train', 'test') for key in METRIC_KEYS}
+    for _, signals, valid in sweep_signals(price, strategy, combos, chunk_size):
+        chunk_metrics = score_signals(price, signals, valid & base_valid[:, None], split_ratio, hold, cost)
+        for column, values in chunk_metrics.items():
+            results[column].append(values)
+
+    table = pd.DataFrame(combos, columns=names)
+    for column, parts in results.items():
+        table[column] = np.concatenate(parts) if parts else []
+
+    return table.sort_values(rank_by, ascending=False, kind='stable').reset_index(drop=True)
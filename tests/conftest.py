@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules live at the repository root
+sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(autouse=True, scope='session')
+def repo_root():
+    """Run from the repository root: config's data paths are relative to it"""
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    yield ROOT
+    os.chdir(cwd)
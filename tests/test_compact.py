@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from config import DATA_SOURCE_OPTIONS, FLOAT32_TOLERANCE, LOCAL_PAIRS
+from data_loader import load_data
+from engine import downcast_columns, run_backtest
+from strategies import indicator_columns, strategy_names
+
+
+@pytest.fixture(scope='module')
+def prices():
+    frames = {pair: load_data(DATA_SOURCE_OPTIONS[1], pair) for pair in LOCAL_PAIRS}
+    missing = [pair for pair, df in frames.items() if df is None or df.empty]
+    assert not missing, f"bundled local data missing for {missing}"
+    return frames
+
+
+@pytest.mark.parametrize('strategy', strategy_names())
+@pytest.mark.parametrize('pair', LOCAL_PAIRS)
+def test_compact_matches_full(prices, pair, strategy):
+    full_df, full = run_backtest(prices[pair], strategy)
+    compact_df, compact = run_backtest(prices[pair], strategy, compact=True)
+
+    for part in ('train', 'test'):
+        assert compact[part] == pytest.approx(full[part], rel=FLOAT32_TOLERANCE, nan_ok=True)
+    assert compact['market_return'] == pytest.approx(full['market_return'], rel=FLOAT32_TOLERANCE)
+    assert compact_df.index.equals(full_df.index)
+    assert (compact_df['Signal'].to_numpy() == full_df['Signal'].to_numpy()).all()
+
+    for col in indicator_columns(strategy):
+        assert compact_df[col].dtype == np.float32
+        expected = full_df[col].to_numpy()
+        error = np.nanmax(np.abs(compact_df[col].to_numpy(dtype=float) - expected))
+        assert error <= FLOAT32_TOLERANCE * np.nanmax(np.abs(expected)), col
+
+
+def test_downcast_keeps_out_of_range_columns():
+    df = pd.DataFrame({'small': [1.0, np.nan, -2.5], 'large': [1.0, 1e300, np.nan]})
+    assert downcast_columns(df, ['small', 'large']) == ['small']
+    assert df['small'].dtype == np.float32
+    assert df['large'].dtype == np.float64
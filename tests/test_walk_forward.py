@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from benchmark import synthetic_ohlc
+from walk_forward import walk_forward
+
+GRID = {'rsi_period': [10, 14], 'rsi_oversold': [25, 30, 35], 'rsi_overbought': [65, 70]}
+
+
+@pytest.fixture(scope='module')
+def prices():
+    return synthetic_ohlc(1200, seed=3, freq='D', volatility=0.005)
+
+
+def single_combo_scores(df, rank_by, **kwargs):
+    """{combo: that combo's training score on each window}, one walk-forward run per combo"""
+    scores = {}
+    for period in GRID['rsi_period']:
+        for lower in GRID['rsi_oversold']:
+            for upper in GRID['rsi_overbought']:
+                grid = {'rsi_period': [period], 'rsi_oversold': [lower], 'rsi_overbought': [upper]}
+                windows = walk_forward(df, "RSI Strategy", param_grid=grid, rank_by=rank_by, **kwargs)['windows']
+                scores[(period, lower, upper)] = windows[f'train_{rank_by}'].to_numpy()
+    return scores
+
+
+@pytest.mark.parametrize('rank_by, best', [('sharpe', np.max), ('max_drawdown_duration', np.min)])
+def test_picks_the_best_combo_in_the_metric_direction(prices, rank_by, best):
+    kwargs = {'train_bars': 250, 'test_bars': 100}
+    windows = walk_forward(prices, "RSI Strategy", param_grid=GRID, rank_by=rank_by, **kwargs)['windows']
+    scores = single_combo_scores(prices, rank_by, **kwargs)
+    table = np.column_stack(list(scores.values()))
+
+    # Scores of a combination computed alone or in a chunk differ in the last bits
+    np.testing.assert_allclose(windows[f'train_{rank_by}'], best(table, axis=1), rtol=1e-12)
+    assert len(set(windows[f'train_{rank_by}'])) > 1
+    for k, row in windows.iterrows():
+        combo = (row['rsi_period'], row['rsi_oversold'], row['rsi_overbought'])
+        assert scores[combo][k] == pytest.approx(best(table[k]), rel=1e-12)
+
+
+def test_windows_without_a_usable_score_are_skipped(prices):
+    # The first training window ends before any RSI in the grid has warmed up
+    result = walk_forward(prices, "RSI Strategy", train_bars=10, test_bars=50, param_grid=GRID)
+    windows = result['windows']
+    assert windows['train_start'].iloc[0] == prices.index[50]
+    assert np.isfinite(windows['train_sharpe']).all()
+    assert result['returns'].index[0] == windows['test_start'].iloc[0]
+
+
+def test_raises_when_no_window_has_a_usable_score(prices):
+    # Every training window ends before any RSI in the grid has warmed up
+    with pytest.raises(ValueError, match="finite sharpe"):
+        walk_forward(prices.iloc[:12], "RSI Strategy", train_bars=8, test_bars=2, param_grid=GRID)
+
+
+def test_rejects_unknown_rank_by(prices):
+    with pytest.raises(ValueError, match="Unknown metric"):
+        walk_forward(prices, "RSI Strategy", train_bars=250, test_bars=100, rank_by='trades')
@@ -0,0 +1,121 @@
+import numpy as np
+import pandas as pd
+
+from yahoo_cache import PRICE_COLUMNS, _read_index, load_cached, load_many, missing_ranges
+
+
+class FakeFetcher:
+    """Daily bars for [start, end) with the date's ordinal as the price; records every call"""
+
+    def __init__(self, overlap=0):
+        self.calls = []
+        self.overlap = overlap  # extra days returned before start, like a provider padding its range
+
+    def __call__(self, ticker, start, end):
+        self.calls.append((ticker, start, end))
+        index = pd.date_range(start - pd.Timedelta(days=self.overlap), end, freq='D', inclusive='left')
+        values = np.array([d.toordinal() for d in index], dtype=float)
+        return pd.DataFrame({col: values for col in PRICE_COLUMNS}, index=index)
+
+
+def day(s):
+    return pd.Timestamp(s)
+
+
+def test_missing_ranges():
+    covered = [[day('2020-01-10'), day('2020-02-01')]]
+    assert missing_ranges(covered, day('2020-01-01'), day('2020-03-01')) == [
+        (day('2020-01-01'), day('2020-01-10')), (day('2020-02-01'), day('2020-03-01'))]
+    assert missing_ranges(covered, day('2020-01-15'), day('2020-01-20')) == []
+    assert missing_ranges([], day('2020-01-01'), day('2020-01-05')) == [(day('2020-01-01'), day('2020-01-05'))]
+
+
+def test_fetches_only_the_missing_head_and_tail(tmp_path):
+    fetcher = FakeFetcher()
+    load_cached('EURUSD=X', '2020-01-10', '2020-02-01', fetcher=fetcher, cache_dir=tmp_path)
+    fetcher.calls.clear()
+
+    df = load_cached('EURUSD=X', '2020-01-01', '2020-03-01', fetcher=fetcher, cache_dir=tmp_path)
+    assert fetcher.calls == [('EURUSD=X', day('2020-01-01'), day('2020-01-10')),
+                             ('EURUSD=X', day('2020-02-01'), day('2020-03-01'))]
+    assert df.index.equals(pd.date_range('2020-01-01', '2020-03-01', freq='D', inclusive='left'))
+
+    fetcher.calls.clear()
+    load_cached('EURUSD=X', '2020-01-05', '2020-02-20', fetcher=fetcher, cache_dir=tmp_path)
+    assert fetcher.calls == []
+
+
+def test_top_ups_merge_without_duplicate_bars(tmp_path):
+    fetcher = FakeFetcher(overlap=3)
+    load_cached('EURUSD=X', '2020-01-01', '2020-01-20', fetcher=fetcher, cache_dir=tmp_path)
+    load_cached('EURUSD=X', '2020-01-20', '2020-02-10', fetcher=fetcher, cache_dir=tmp_path)
+    df = load_cached('EURUSD=X', '2019-12-20', '2020-02-10', fetcher=fetcher, cache_dir=tmp_path)
+
+    expected = pd.date_range('2019-12-20', '2020-02-10', freq='D', inclusive='left')
+    assert df.index.is_unique
+    assert df.index.equals(expected)
+    assert (df['Adj Close'].to_numpy() == [d.toordinal() for d in expected]).all()
+    assert len(fetcher.calls) == 3
+
+
+def test_evicts_least_recently_used_to_the_size_budget(tmp_path):
+    fetcher = FakeFetcher()
+    for ticker in ['A=X', 'B=X', 'C=X']:
+        load_cached(ticker, '2020-01-01', '2020-06-01', fetcher=fetcher, cache_dir=tmp_path)
+    # Reading A again (no fetch) makes it the most recently used
+    load_cached('A=X', '2020-02-01', '2020-03-01', fetcher=fetcher, cache_dir=tmp_path)
+    assert len(fetcher.calls) == 3
+
+    size = max(entry['bytes'] for entry in _read_index(tmp_path).values())
+    load_cached('D=X', '2020-01-01', '2020-06-01', fetcher=fetcher, cache_dir=tmp_path,
+                max_bytes=int(2.5 * size))
+
+    index = _read_index(tmp_path)
+    assert sorted(index) == ['A=X', 'D=X']
+    assert sum(entry['bytes'] for entry in index.values()) <= 2.5 * size
+    assert sorted(p.name for p in tmp_path.glob('*.pkl')) == ['A_X.pkl', 'D_X.pkl']
+
+
+class FakeTransport:
+    """fetch_batch that fails the ranges starting at a date in fail_from, for the first `times` calls of each"""
+
+    def __init__(self, fail_from=(), times=float('inf')):
+        self.fetcher = FakeFetcher()
+        self.fail_from = {day(d) for d in fail_from}
+        self.times = times
+        self.calls = []
+
+    def __call__(self, tickers, start, end):
+        self.calls.append((tuple(tickers), start, end))
+        attempt = sum(1 for _, s, _ in self.calls if s == start)
+        if start in self.fail_from and attempt <= self.times:
+            return {ticker: ConnectionError("timed out") for ticker in tickers}
+        return {ticker: self.fetcher(ticker, start, end) for ticker in tickers}
+
+
+def test_load_many_reports_a_range_that_never_loaded(tmp_path):
+    # Cache the middle so EURUSD=X has a head range (always failing) and a tail range
+    load_cached('EURUSD=X', '2020-01-10', '2020-02-01', fetcher=FakeFetcher(), cache_dir=tmp_path)
+    transport = FakeTransport(fail_from=['2020-01-01'])
+    frames, errors = load_many(['EURUSD=X', 'GBPUSD=X'], '2020-01-01', '2020-03-01', fetch_batch=transport,
+                               retries=3, cache_dir=tmp_path, sleep=lambda seconds: None)
+
+    assert set(errors) == {'EURUSD=X', 'GBPUSD=X'}
+    assert errors['EURUSD=X'] == "2020-01-01 to 2020-01-10: timed out"
+    assert errors['GBPUSD=X'] == "2020-01-01 to 2020-03-01: timed out"
+    head_calls = [call for call in transport.calls if call[1] == day('2020-01-01')]
+    assert len(head_calls) == 2 * 4
+    # The bars that did load are still returned
+    assert frames['EURUSD=X'].index[0] == day('2020-01-10')
+    assert frames['EURUSD=X'].index[-1] == day('2020-02-29')
+    assert 'GBPUSD=X' not in frames
+
+
+def test_load_many_clears_an_error_when_a_retry_of_that_range_loads(tmp_path):
+    load_cached('EURUSD=X', '2020-01-10', '2020-02-01', fetcher=FakeFetcher(), cache_dir=tmp_path)
+    transport = FakeTransport(fail_from=['2020-01-01'], times=2)
+    frames, errors = load_many(['EURUSD=X'], '2020-01-01', '2020-03-01', fetch_batch=transport,
+                               retries=3, cache_dir=tmp_path, sleep=lambda seconds: None)
+
+    assert errors == {}
+    assert frames['EURUSD=X'].index.equals(pd.date_range('2020-01-01', '2020-03-01', freq='D', inclusive='left'))
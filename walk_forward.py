@@ -0,0 +1,121 @@
+# walk_forward.py
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from metrics import LOWER_IS_BETTER, PERIODS_PER_YEAR, RETURNS_METRIC_KEYS, calculate_returns_metrics
+from sweep import expand_grid, price_returns, sweep_signals
+
+
+def make_windows(n_rows, train_bars, test_bars, step_bars=None, start=0):
+    """
+    Rolling (train_start, train_end, test_start, test_end) row ranges, ends
+    exclusive. Windows advance by step_bars (default: test_bars) and the
+    last test window is cut short at the end of the data.
+    """
+    step_bars = step_bars or test_bars
+    windows = []
+    train_start = start
+    while train_start + train_bars < n_rows:
+        test_start = train_start + train_bars
+        windows.append((train_start, test_start, test_start, min(test_start + test_bars, n_rows)))
+        train_start += step_bars
+    return windows
+
+
+def walk_forward(df, strategy, train_bars, test_bars, step_bars=None, param_grid=None,
+                 rank_by='sharpe', max_workers=None, chunk_size=1024,
+                 periods_per_year=PERIODS_PER_YEAR):
+    """
+    Walk-forward optimization: pick the best parameters (by ``rank_by``)
+    on each training window and trade them on the following test window.
+
+    Indicators and signals for every combination are computed once on the
+    full history and shared by all (overlapping) windows; the windows are
+    optimized in parallel threads. Returns a dict with the per-window
+    choices ('windows'), the stitched out-of-sample 'returns' and 'equity',
+    and 'metrics' for the stitched returns.
+    rank_by is one of metrics.RETURNS_METRIC_KEYS; the highest value wins
+    except for metrics.LOWER_IS_BETTER. Combinations with no usable bars in
+    a training window (e.g. still warming up) or a non-finite score are
+    not candidates, and a window without any candidate is skipped.
+    """
+    if rank_by not in RETURNS_METRIC_KEYS:
+        raise ValueError(f"Unknown metric to rank by: {rank_by}")
+    sign = -1 if rank_by in LOWER_IS_BETTER else 1
+    names, combos = expand_grid(strategy, param_grid)
+    price, returns = price_returns(df)
+    n_rows = len(price)
+
+    # Positions for every combination (int8, one column each) and the first
+    # row where each combination's indicator is warmed up (n_rows if never)
+    positions = np.zeros((n_rows, len(combos)), dtype=np.int8)
+    valid_from = np.zeros(len(combos), dtype=np.int64)
+    for start, signals, valid in sweep_signals(price, strategy, combos, chunk_size):
+        cols = slice(start, start + signals.shape[1])
+        positions[1:, cols] = signals[:-1]
+        valid_from[cols] = np.where(valid.any(axis=0), np.argmax(valid, axis=0), n_rows)
+    base_valid = df.notna().all(axis=1).to_numpy() & ~np.isnan(returns)
+    row_numbers = np.arange(n_rows)
+
+    def window_mask(rows, cols):
+        return (row_numbers[rows, None] >= valid_from[None, cols]) & base_valid[rows, None]
+
+    def optimize(window):
+        train_start, train_end, _, _ = window
+        rows = slice(train_start, train_end)
+        best_col, best_rank = None, -np.inf
+        for start in range(0, len(combos), chunk_size):
+            cols = slice(start, min(start + chunk_size, len(combos)))
+            held = positions[rows, cols]
+            mask = window_mask(rows, cols)
+            scores = calculate_returns_metrics(held * returns[rows, None], held, mask,
+                                               periods_per_year)[rank_by]
+            ranks = np.where(np.isfinite(scores) & mask.any(axis=0), sign * scores, -np.inf)
+            j = int(np.argmax(ranks))
+            if ranks[j] > best_rank:
+                best_col, best_rank = start + j, ranks[j]
+        return best_col, None if best_col is None else sign * float(best_rank)
+
+    windows = make_windows(n_rows, train_bars, test_bars, step_bars)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        chosen = list(pool.map(optimize, windows))
+    kept = [(window, choice) for window, choice in zip(windows, chosen) if choice[0] is not None]
+    if not kept:
+        raise ValueError(f"No training window has a finite {rank_by} for any parameter combination")
+    windows, chosen = zip(*kept)
+
+    # Stitch the test windows; a window hands over to the next one's test start
+    oos_returns = np.full(n_rows, np.nan)
+    rows_out = []
+    for k, ((train_start, train_end, test_start, test_end), (col, score)) in enumerate(zip(windows, chosen)):
+        stitch_end = min(test_end, windows[k + 1][2]) if k + 1 < len(windows) else test_end
+        rows = slice(test_start, test_end)
+        held = positions[rows, col]
+        test_returns = held * returns[rows]
+        test_mask = window_mask(rows, slice(col, col + 1))[:, 0]
+        test_metrics = calculate_returns_metrics(np.where(test_mask, test_returns, np.nan), held,
+                                                 periods_per_year=periods_per_year)
+        oos_returns[test_start:stitch_end] = np.where(test_mask, test_returns, 0.0)[:stitch_end - test_start]
+
+        rows_out.append({
+            'train_start': df.index[train_start],
+            'train_end': df.index[train_end - 1],
+            'test_start': df.index[test_start],
+            'test_end': df.index[test_end - 1],
+            **combos[col],
+            f'train_{rank_by}': score,
+            'test_total_return': test_metrics['total_return'],
+            'test_sharpe': test_metrics['sharpe'],
+            'test_max_drawdown': test_metrics['max_drawdown']
+        })
+
+    covered = ~np.isnan(oos_returns)
+    oos = pd.Series(oos_returns[covered], index=df.index[covered], name='Strategy_Returns')
+    return {
+        'windows': pd.DataFrame(rows_out, columns=['train_start', 'train_end', 'test_start', 'test_end']
+                                + names + [f'train_{rank_by}', 'test_total_return', 'test_sharpe',
+                                           'test_max_drawdown']),
+        'returns': oos,
+        'equity': (1 + oos).cumprod().rename('Cumulative_Strategy'),
+        'metrics': calculate_returns_metrics(oos.to_numpy(), periods_per_year=periods_per_year)
+    }
@@ -0,0 +1,338 @@
+# yahoo_cache.py
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from config import YAHOO_CACHE_DIR, YAHOO_CACHE_MAX_BYTES
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume']
+
+_lock = threading.Lock()
+
+
+def normalize_columns(df, ticker):
+    """
+    Flatten a yf.download frame to the standard price columns.
+    Returns None when no price column can be found.
+    """
+    # Handle multi-level columns (tuple issue)
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = [col[0] for col in df.columns]
+    else:
+        df.columns = [str(col).replace(f' {ticker}', '').replace(ticker, '').strip() for col in df.columns]
+
+    # Create standardized columns
+    for std_col in PRICE_COLUMNS:
+        # Try to find matching column
+        for col in df.columns:
+            if std_col.lower() in col.lower():
+                df[std_col] = df[col]
+                break
+
+    # Ensure we have Adj Close (use Close if not available)
+    if 'Adj Close' not in df.columns:
+        if 'Close' in df.columns:
+            df['Adj Close'] = df['Close']
+        else:
+            # Try to find any price column
+            price_cols = [col for col in df.columns if 'close' in col.lower() or 'price' in col.lower()]
+            if price_cols:
+                df['Adj Close'] = df[price_cols[0]]
+            else:
+                return None
+
+    # Keep only necessary columns
+    df = df[[col for col in PRICE_COLUMNS if col in df.columns]]
+
+    # Store naive timestamps so cached and fresh bars line up
+    if isinstance(df.index, pd.DatetimeIndex) and df.index.tz is not None:
+        df.index = df.index.tz_convert('UTC').tz_localize(None)
+    return df
+
+
+def yahoo_fetcher(ticker, start, end):
+    """
+    Default fetcher: download [start, end) from Yahoo Finance.
+    Any fetcher(ticker, start, end) -> DataFrame with PRICE_COLUMNS works.
+    """
+    import yfinance as yf
+
+    df = yf.download(ticker, start=start.strftime('%Y-%m-%d'), end=end.strftime('%Y-%m-%d'),
+                     progress=False)
+    if df is None or df.empty:
+        return pd.DataFrame(columns=PRICE_COLUMNS)
+    df = normalize_columns(df, ticker)
+    if df is None:
+        raise ValueError("No price data found in Yahoo Finance response")
+    return df
+
+
+def yahoo_batch_fetcher(tickers, start, end):
+    """
+    Default batch transport: one yf.download for all the tickers (yfinance
+    fetches them on its own threads), split by ticker and normalized.
+    Any fetch_batch(tickers, start, end) -> {ticker: DataFrame or
+    Exception} works; missing tickers count as failed.
+    """
+    import yfinance as yf
+
+    df = yf.download(list(tickers), start=start.strftime('%Y-%m-%d'), end=end.strftime('%Y-%m-%d'),
+                     group_by='ticker', progress=False, threads=True)
+    if df is None or df.empty:
+        return {ticker: pd.DataFrame(columns=PRICE_COLUMNS) for ticker in tickers}
+
+    results = {}
+    returned = set(df.columns.get_level_values(0)) if isinstance(df.columns, pd.MultiIndex) else set()
+    for ticker in tickers:
+        bars = df[ticker].dropna(how='all') if ticker in returned else None
+        if bars is None or bars.empty:
+            results[ticker] = ValueError(f"No data for {ticker} in the Yahoo Finance response")
+            continue
+        bars = normalize_columns(bars.copy(), ticker)
+        results[ticker] = bars if bars is not None else ValueError("No price data found in Yahoo Finance response")
+    return results
+
+
+def pooled(fetcher, max_workers=8):
+    """Batch transport running a per-ticker fetcher(ticker, start, end) on a bounded thread pool"""
+    def fetch_batch(tickers, start, end):
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(tickers)))) as pool:
+            futures = {ticker: pool.submit(fetcher, ticker, start, end) for ticker in tickers}
+        results = {}
+        for ticker, future in futures.items():
+            try:
+                results[ticker] = future.result()
+            except Exception as e:
+                results[ticker] = e
+        return results
+    return fetch_batch
+
+
+# ==============================
+# Cache index: {ticker: {'file', 'bytes', 'last_used', 'covered': [[start, end], ...]}}
+# ==============================
+def _index_path(cache_dir):
+    return os.path.join(cache_dir, 'index.json')
+
+
+def _read_index(cache_dir):
+    try:
+        with open(_index_path(cache_dir)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(cache_dir, index):
+    tmp_path = _index_path(cache_dir) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, _index_path(cache_dir))
+
+
+def _ticker_file(ticker):
+    return ''.join(c if c.isalnum() else '_' for c in ticker) + '.pkl'
+
+
+def _merge_ranges(ranges):
+    """Union of [start, end) ranges, sorted"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def missing_ranges(covered, start, end):
+    """Parts of [start, end) not inside any covered range"""
+    gaps = []
+    cursor = start
+    for c_start, c_end in _merge_ranges(covered):
+        if c_end <= cursor:
+            continue
+        if c_start >= end:
+            break
+        if c_start > cursor:
+            gaps.append((cursor, c_start))
+        cursor = max(cursor, c_end)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def _evict(cache_dir, index, max_bytes, keep):
+    """Drop least recently used tickers until the cache fits in max_bytes"""
+    total = sum(entry['bytes'] for entry in index.values())
+    for ticker in sorted(index, key=lambda t: index[t]['last_used']):
+        if total <= max_bytes:
+            break
+        if ticker == keep:
+            continue
+        entry = index.pop(ticker)
+        total -= entry['bytes']
+        try:
+            os.remove(os.path.join(cache_dir, entry['file']))
+        except OSError:
+            pass
+
+
+def _covered(cache_dir, index, ticker):
+    """Covered [start, end) ranges of a ticker (none when its file is gone)"""
+    entry = index.get(ticker)
+    if entry is None or not os.path.exists(os.path.join(cache_dir, _ticker_file(ticker))):
+        return []
+    return [[pd.Timestamp(s), pd.Timestamp(e)] for s, e in entry['covered']]
+
+
+def _covered_until(end):
+    # Today's bar is still moving, so never count it as covered
+    return min(end, pd.Timestamp.today().normalize())
+
+
+def _save(ticker, new_frames, new_covered, start, end, cache_dir, max_bytes):
+    """
+    Merge fetched bars and ranges into the stored series (re-read under
+    the lock, so concurrent loads of the same ticker don't lose bars) and
+    return the bars for start <= date < end.
+    """
+    with _lock:
+        os.makedirs(cache_dir, exist_ok=True)
+        index = _read_index(cache_dir)
+        covered = _covered(cache_dir, index, ticker) + new_covered
+        path = os.path.join(cache_dir, _ticker_file(ticker))
+        stored = pd.read_pickle(path) if ticker in index and os.path.exists(path) else None
+
+        if new_frames:
+            frames = ([stored] if stored is not None else []) + new_frames
+            stored = pd.concat(frames)
+            stored = stored[~stored.index.duplicated(keep='last')].sort_index()
+            stored.to_pickle(path)
+
+        if stored is None:
+            return pd.DataFrame(columns=PRICE_COLUMNS)
+
+        index[ticker] = {
+            'file': _ticker_file(ticker),
+            'bytes': os.path.getsize(path),
+            'last_used': time.time(),
+            'covered': [[s.isoformat(), e.isoformat()] for s, e in _merge_ranges(covered)]
+        }
+        _evict(cache_dir, index, max_bytes, keep=ticker)
+        _write_index(cache_dir, index)
+
+    return stored[(stored.index >= start) & (stored.index < end)]
+
+
+def load_cached(ticker, start, end, fetcher=yahoo_fetcher,
+                cache_dir=YAHOO_CACHE_DIR, max_bytes=YAHOO_CACHE_MAX_BYTES):
+    """
+    Return bars for start <= date < end, fetching only the date ranges
+    that are not cached yet and merging them into the stored series.
+    The cache lock is not held while fetching.
+    """
+    start = pd.Timestamp(start).normalize()
+    end = pd.Timestamp(end).normalize()
+    covered_until = _covered_until(end)
+
+    with _lock:
+        covered = _covered(cache_dir, _read_index(cache_dir), ticker)
+
+    new_frames, new_covered = [], []
+    for gap_start, gap_end in missing_ranges(covered, start, end):
+        bars = fetcher(ticker, gap_start, gap_end)
+        if bars is None or bars.empty:
+            continue  # don't cache holes, they may be fetch errors
+        new_frames.append(bars)
+        if gap_start < covered_until:
+            new_covered.append([gap_start, min(gap_end, covered_until)])
+
+    return _save(ticker, new_frames, new_covered, start, end, cache_dir, max_bytes)
+
+
+def load_many(tickers, start, end, fetch_batch=yahoo_batch_fetcher, retries=3, backoff=0.5,
+              cache_dir=YAHOO_CACHE_DIR, max_bytes=YAHOO_CACHE_MAX_BYTES, sleep=time.sleep):
+    """
+    load_cached for many tickers at once. The uncached date ranges are
+    fetched with one fetch_batch call per distinct range (usually one for
+    the whole batch; see yahoo_batch_fetcher, or pooled() for a per-ticker
+    fetcher). Tickers that fail are retried together after backoff,
+    2 * backoff, 4 * backoff ... seconds, up to ``retries`` times.
+
+    Returns ({ticker: DataFrame}, {ticker: error message}). A ticker is an
+    error when any of its ranges never loaded (the message names each such
+    range); it can be in both when some of its bars were cached or fetched.
+    """
+    start = pd.Timestamp(start).normalize()
+    end = pd.Timestamp(end).normalize()
+    covered_until = _covered_until(end)
+    tickers = list(dict.fromkeys(tickers))
+
+    with _lock:
+        index = _read_index(cache_dir)
+        gaps = {ticker: missing_ranges(_covered(cache_dir, index, ticker), start, end) for ticker in tickers}
+
+    requests = {}
+    for ticker, ranges in gaps.items():
+        for gap in ranges:
+            requests.setdefault(gap, []).append(ticker)
+
+    new_frames = {ticker: [] for ticker in tickers}
+    new_covered = {ticker: [] for ticker in tickers}
+    failures = {}  # (ticker, range) -> last error, cleared when a retry of that range loads
+    for gap, pending in requests.items():
+        gap_start, gap_end = gap
+        for attempt in range(retries + 1):
+            try:
+                results = fetch_batch(pending, gap_start, gap_end)
+            except Exception as e:
+                results = {ticker: e for ticker in pending}
+
+            failed = []
+            for ticker in pending:
+                bars = results.get(ticker, KeyError(f"No response for {ticker}"))
+                if isinstance(bars, Exception):
+                    failures[(ticker, gap)] = str(bars)
+                    failed.append(ticker)
+                    continue
+                failures.pop((ticker, gap), None)
+                if bars is None or bars.empty:
+                    continue  # don't cache holes
+                new_frames[ticker].append(bars)
+                if gap_start < covered_until:
+                    new_covered[ticker].append([gap_start, min(gap_end, covered_until)])
+
+            pending = failed
+            if not pending:
+                break
+            if attempt < retries:
+                sleep(backoff * 2 ** attempt)
+
+    errors = {}
+    for (ticker, (gap_start, gap_end)), message in sorted(failures.items()):
+        failed_range = f"{gap_start:%Y-%m-%d} to {gap_end:%Y-%m-%d}: {message}"
+        errors[ticker] = f"{errors[ticker]}; {failed_range}" if ticker in errors else failed_range
+
+    frames = {}
+    for ticker in tickers:
+        df = _save(ticker, new_frames[ticker], new_covered[ticker], start, end, cache_dir, max_bytes)
+        if not df.empty:
+            frames[ticker] = df
+        elif ticker not in errors:
+            errors[ticker] = "No data returned"
+    return frames, errors
+
+
+def clear_cache(cache_dir=YAHOO_CACHE_DIR):
+    """Remove every cached ticker"""
+    with _lock:
+        for entry in _read_index(cache_dir).values():
+            try:
+                os.remove(os.path.join(cache_dir, entry['file']))
+            except OSError:
+                pass
+        if os.path.isdir(cache_dir):
+            _write_index(cache_dir, {})